@@ -0,0 +1,112 @@
+"""Micro-benchmark: per-update cost of finding the callback query handler.
+
+Compares the regex handler chain the bot used to register (every callback
+is matched against one CallbackQueryHandler after another) with the
+CallbackRouter, for the current menus and with extra menus added. Each
+extra menu adds one handler to the chain and one route to the router, and
+the payloads are spread evenly over all menus plus one unknown payload.
+
+    python benchmarks/callback_router_benchmark.py [iterations]
+"""
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from telegram import CallbackQuery, Update, User  # noqa: E402
+from telegram.ext import CallbackQueryHandler, CommandHandler, ConversationHandler  # noqa: E402
+
+import my_resume  # noqa: E402
+
+EXTRA_MENUS = (0, 10, 50, 200)
+
+OLD_PAYLOADS = [
+    "lang_en", "lang_admin_uz", "change_lang", "send_message", "resume_eng", "file_info", "statistics",
+    "users|n|*|0|2026-01-01 12:00:00|5", "contact", "back_menu",
+]
+NEW_PAYLOADS = [
+    "v1:lang:set:en", "v1:admin:panel:uz", "v1:menu:language", "v1:admin:message", "v1:resume:get:eng",
+    "v1:admin:files", "v1:admin:stats", "v1:admin:users:n:*:0:5:2026-01-01 12:00:00", "v1:menu:contact",
+    "v1:menu:back",
+]
+
+
+async def noop(update, context):
+    return None
+
+
+def old_handler_chain(extra_menus: int) -> list:
+    """The callback handlers as build_application registered them before the router"""
+    conversation = ConversationHandler(
+        entry_points=[CallbackQueryHandler(noop, pattern="^update_resume_|^send_message")],
+        states={my_resume.WAITING_FOR_RESUME: [CommandHandler("cancel", noop)]},
+        fallbacks=[CommandHandler("cancel", noop)],
+        per_message=False
+    )
+    return [
+        CallbackQueryHandler(noop, pattern="^lang_uz|^lang_ru|^lang_en"),
+        CallbackQueryHandler(noop, pattern="^lang_admin_"),
+        CallbackQueryHandler(noop, pattern="^change_lang"),
+        conversation,
+        CallbackQueryHandler(noop, pattern="^resume_"),
+        CallbackQueryHandler(noop, pattern="^file_info|^rollback_resume_|^statistics|^users_list|^users\\|"),
+        *(CallbackQueryHandler(noop, pattern=f"^menu{index}_") for index in range(extra_menus)),
+        CallbackQueryHandler(noop, pattern="^contact"),
+        CallbackQueryHandler(noop, pattern="^back_menu"),
+    ]
+
+
+def router_handler_chain(extra_menus: int) -> list:
+    """The callback handlers of the current build_application"""
+    router = my_resume.CallbackRouter()
+    router.routes.update(my_resume.callback_router.routes)
+    for index in range(extra_menus):
+        router.add(f"menu{index}", "open", noop)
+
+    conversation = ConversationHandler(
+        entry_points=[CallbackQueryHandler(noop, pattern=router.matcher(conversation=True))],
+        states={my_resume.WAITING_FOR_RESUME: [CommandHandler("cancel", noop)]},
+        fallbacks=[CommandHandler("cancel", noop)],
+        per_message=False
+    )
+    return [conversation, CallbackQueryHandler(noop, pattern=router.matcher(conversation=False))]
+
+
+def callback_updates(payloads: list) -> list:
+    user = User(id=1, first_name="U", is_bot=False)
+    return [
+        Update(update_id=index, callback_query=CallbackQuery(id=str(index), from_user=user, chat_instance="c",
+                                                             data=payload))
+        for index, payload in enumerate(payloads)
+    ]
+
+
+def bench(handlers: list, updates: list, iterations: int) -> float:
+    """Return microseconds per update to find the first matching handler, best of 5 runs"""
+    def run():
+        for index in range(iterations):
+            update = updates[index % len(updates)]
+            for handler in handlers:
+                check = handler.check_update(update)
+                if check is not None and check is not False:
+                    break
+
+    return min(timeit.repeat(run, number=1, repeat=5)) / iterations * 1e6
+
+
+def main() -> None:
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+
+    print(f"{'menus':<8}{'before (us)':>14}{'after (us)':>14}{'speedup':>10}")
+    for extra_menus in EXTRA_MENUS:
+        old_payloads = OLD_PAYLOADS + [f"menu{index}_open" for index in range(extra_menus)] + ["unknown"]
+        new_payloads = NEW_PAYLOADS + [f"v1:menu{index}:open" for index in range(extra_menus)] + ["v1:unknown:x"]
+
+        before_us = bench(old_handler_chain(extra_menus), callback_updates(old_payloads), iterations)
+        after_us = bench(router_handler_chain(extra_menus), callback_updates(new_payloads), iterations)
+        print(f"{len(NEW_PAYLOADS) + extra_menus:<8}{before_us:>14.2f}{after_us:>14.2f}{before_us / after_us:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
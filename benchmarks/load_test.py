@@ -0,0 +1,364 @@
+"""Offline load test of the handler chain.
+
+Replays generated (or recorded) updates through Application.process_update
+with a fake Bot API transport, so no network or bot token is needed. The
+bot runs in a temporary directory with a fresh database and a copy of the
+resumes, and the report shows handler latency percentiles, updates/s,
+database write statements per update and memory.
+
+    python benchmarks/load_test.py [--users 200] [--rounds 5] [--concurrency 32]
+                                   [--api-latency 0] [--rate-limit] [--replay FILE_OR_DIR ...]
+                                   [--workers 1] [--max-p95 MS] [--json]
+
+Outbound rate limits are off unless --rate-limit is given, since generated
+users send updates without pauses. Recorded updates are JSON files holding
+one update, a list of updates, or one update per line (e.g.
+tools/sample_updates/). With --max-p95 the exit status is 1 when the p95
+latency exceeds the given number of milliseconds. With --workers N the
+updates are split by chat over N processes sharing one database, the way
+WORKERS=N splits them, and the report covers all of them.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import random
+import resource
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+ADMIN_ID = 1000000
+
+sys.path.insert(0, str(ROOT))
+
+from telegram import Update  # noqa: E402
+from telegram.request import BaseRequest  # noqa: E402
+
+
+class FakeBotAPI(BaseRequest):
+    """Answers Bot API calls locally with minimal valid results"""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.calls = 0
+        self._message_id = 0
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
+
+    @property
+    def read_timeout(self):
+        return 5.0
+
+    async def do_request(self, url, method, request_data=None, read_timeout=None, write_timeout=None,
+                         connect_timeout=None, pool_timeout=None):
+        self.calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        endpoint = url.rsplit("/", 1)[-1]
+        params = request_data.parameters if request_data else {}
+        self._message_id += 1
+
+        if endpoint == "getMe":
+            result = {"id": 1, "is_bot": True, "first_name": "Bench", "username": "bench_bot"}
+        elif endpoint in ("sendMessage", "editMessageText", "sendDocument"):
+            result = {"message_id": self._message_id, "date": 0,
+                      "chat": {"id": params.get("chat_id", 1), "type": "private"}, "text": "ok"}
+            if endpoint == "sendDocument":
+                result["document"] = {"file_id": f"bench-{self._message_id}", "file_unique_id": "bench"}
+        else:
+            result = True
+
+        return 200, json.dumps({"ok": True, "result": result}).encode()
+
+
+class UpdateFactory:
+    """Builds raw update dicts with increasing ids"""
+
+    def __init__(self):
+        self.update_id = 0
+
+    def _user(self, user_id: int) -> dict:
+        return {"id": user_id, "is_bot": False, "first_name": f"User{user_id}", "username": f"user{user_id}"}
+
+    def message(self, user_id: int, text: str) -> dict:
+        self.update_id += 1
+        message = {"message_id": self.update_id, "date": int(time.time()), "text": text,
+                   "chat": {"id": user_id, "type": "private"}, "from": self._user(user_id)}
+        if text.startswith("/"):
+            message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}]
+        return {"update_id": self.update_id, "message": message}
+
+    def callback(self, user_id: int, data: str) -> dict:
+        self.update_id += 1
+        return {"update_id": self.update_id, "callback_query": {
+            "id": str(self.update_id), "chat_instance": "bench", "data": data, "from": self._user(user_id),
+            "message": {"message_id": 1, "date": int(time.time()), "text": "menu",
+                        "chat": {"id": user_id, "type": "private"}}
+        }}
+
+
+def generate_sessions(users: int, rounds: int, seed: int) -> list:
+    """One list of updates per user, in the order a real user would send them"""
+    rng = random.Random(seed)
+    factory = UpdateFactory()
+    sessions = []
+
+    for user_id in range(1, users + 1):
+        language = rng.choice(["uz", "ru", "en"])
+        session = [factory.message(user_id, "/start"), factory.callback(user_id, f"v1:lang:set:{language}")]
+        for _ in range(rounds):
+            session.append(factory.message(user_id, "/resume"))
+            session.append(factory.callback(user_id, "v1:resume:get:" + rng.choice(["uzb", "eng", "rus"])))
+            if rng.random() < 0.3:
+                session.append(factory.callback(user_id, "v1:menu:contact"))
+                session.append(factory.callback(user_id, "v1:menu:back"))
+        sessions.append(session)
+
+    admin = [factory.message(ADMIN_ID, "/start"), factory.callback(ADMIN_ID, "v1:lang:set:uz")]
+    for _ in range(rounds):
+        admin.append(factory.message(ADMIN_ID, "/admin"))
+        admin.append(factory.callback(ADMIN_ID, "v1:admin:panel:uz"))
+        admin.append(factory.callback(ADMIN_ID, "v1:admin:stats"))
+        admin.append(factory.callback(ADMIN_ID, "v1:admin:users:n:*:0::"))
+        admin.append(factory.callback(ADMIN_ID, "v1:admin:files"))
+    sessions.append(admin)
+
+    return sessions
+
+
+def load_recorded(paths: list) -> list:
+    """Recorded updates as a single session, in file order"""
+    updates = []
+    files = []
+    for path in map(Path, paths):
+        files.extend(sorted(path.glob("*.json")) if path.is_dir() else [path])
+
+    for file in files:
+        text = file.read_text(encoding="utf-8").strip()
+        try:
+            data = json.loads(text)
+            updates.extend(data if isinstance(data, list) else [data])
+        except json.JSONDecodeError:
+            updates.extend(json.loads(line) for line in text.splitlines() if line.strip())
+
+    return [updates]
+
+
+def shard_sessions(sessions: list, bot, index: int, workers: int) -> list:
+    """The updates a worker process would get, keeping the order within each session"""
+    def chat_id(data: dict) -> int:
+        message = data.get("message") or data.get("callback_query", {}).get("message")
+        if message:
+            return message["chat"]["id"]
+        return data["callback_query"]["from"]["id"]
+
+    shards = ([data for data in session if bot.worker_for(chat_id(data), workers) == index] for session in sessions)
+    return [session for session in shards if session]
+
+
+def percentile(values: list, fraction: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(fraction * (len(values) - 1))))]
+
+
+async def run(args, bot, index: int = 0, barrier=None) -> tuple:
+    bot_api = FakeBotAPI(latency=args.api_latency / 1000)
+
+    # Count write statements on every connection the bot opens
+    writes = [0]
+    get_connection = bot.get_connection
+
+    def counting_get_connection():
+        conn = get_connection()
+        if not getattr(bot._db_local, "bench_traced", False):
+            conn.set_trace_callback(
+                lambda sql: writes.__setitem__(0, writes[0] + 1)
+                if sql.lstrip().split(" ", 1)[0].upper() in ("INSERT", "UPDATE", "DELETE", "REPLACE") else None
+            )
+            bot._db_local.bench_traced = True
+        return conn
+
+    bot.get_connection = counting_get_connection
+
+    bot.init_database()
+    bot.bootstrap_resume_versions()
+    bot.default_tenant.action_logger.start()
+
+    application = bot.build_application("123456:BENCHMARK", request=bot_api)
+    if not args.rate_limit:
+        # Measure the handlers, not Telegram's per-chat and global limits
+        application.bot.rate_limiter.throttled = ()
+    await application.initialize()
+    await application.start()
+
+    sessions = load_recorded(args.replay) if args.replay else generate_sessions(args.users, args.rounds, args.seed)
+    if args.workers > 1:
+        sessions = shard_sessions(sessions, bot, index, args.workers)
+    total = sum(len(session) for session in sessions)
+    latencies = []
+    errors = [0]
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def play(session: list) -> None:
+        # Updates of one user are sequential, different users run concurrently
+        for data in session:
+            update = Update.de_json(data, application.bot)
+            async with semaphore:
+                started = time.perf_counter()
+                try:
+                    await application.process_update(update)
+                except Exception:
+                    errors[0] += 1
+                latencies.append(time.perf_counter() - started)
+
+    writes_before = writes[0]
+    calls_before = bot_api.calls
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if barrier is not None:
+        # All worker processes start sending at the same time
+        await asyncio.to_thread(barrier.wait)
+    started = time.perf_counter()
+
+    await asyncio.gather(*(play(session) for session in sessions))
+    elapsed = time.perf_counter() - started
+
+    # Include the write-behind action log and the persistence flush
+    await asyncio.to_thread(bot.default_tenant.action_logger.flush)
+    await application.update_persistence()
+    await application.persistence.flush()
+
+    result = {
+        "updates": total,
+        "concurrency": args.concurrency,
+        "api_latency_ms": args.api_latency,
+        "seconds": round(elapsed, 3),
+        "updates_per_second": round(total / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+        "max_ms": round(max(latencies, default=0) * 1000, 3),
+        "db_writes_per_update": round((writes[0] - writes_before) / total, 3),
+        "api_calls_per_update": round((bot_api.calls - calls_before) / total, 3),
+        "errors": errors[0],
+        "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "rss_growth_mb": round((resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_before) / 1024, 1),
+    }
+
+    await application.stop()
+    await application.shutdown()
+    return result, latencies
+
+
+def run_worker(args, index: int, barrier, results) -> None:
+    """One load test process of --workers, in the scratch directory of the parent"""
+    import my_resume
+    logging.getLogger().setLevel(logging.WARNING)
+
+    my_resume.worker_index, my_resume.worker_count = index, args.workers
+    results.put(asyncio.run(run(args, my_resume, index, barrier)))
+
+
+def run_workers(args) -> tuple:
+    import my_resume
+
+    # Migrations run once, before the workers open the database
+    my_resume.init_database()
+    my_resume.bootstrap_resume_versions()
+    my_resume.close_connections()
+
+    context = multiprocessing.get_context("spawn")
+    barrier = context.Barrier(args.workers)
+    results = context.Queue()
+    processes = [context.Process(target=run_worker, args=(args, index, barrier, results))
+                 for index in range(args.workers)]
+    for process in processes:
+        process.start()
+    reports = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+
+    latencies = [latency for _, worker_latencies in reports for latency in worker_latencies]
+    reports = [report for report, _ in reports]
+    total = sum(report["updates"] for report in reports)
+    elapsed = max(report["seconds"] for report in reports)
+    result = {
+        "updates": total,
+        "workers": args.workers,
+        "concurrency": args.concurrency,
+        "api_latency_ms": args.api_latency,
+        "seconds": elapsed,
+        "updates_per_second": round(total / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+        "max_ms": round(max(latencies, default=0) * 1000, 3),
+        "db_writes_per_update": round(sum(report["db_writes_per_update"] * report["updates"]
+                                          for report in reports) / total, 3),
+        "api_calls_per_update": round(sum(report["api_calls_per_update"] * report["updates"]
+                                          for report in reports) / total, 3),
+        "errors": sum(report["errors"] for report in reports),
+        "max_rss_mb": max(report["max_rss_mb"] for report in reports),
+        "rss_growth_mb": max(report["rss_growth_mb"] for report in reports),
+    }
+    return result, latencies
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--users", type=int, default=200, help="simulated users")
+    parser.add_argument("--rounds", type=int, default=5, help="menu/download rounds per user")
+    parser.add_argument("--concurrency", type=int, default=32, help="updates processed at the same time")
+    parser.add_argument("--api-latency", type=float, default=0.0, help="simulated Bot API latency in ms")
+    parser.add_argument("--rate-limit", action="store_true", help="keep the outbound rate limits")
+    parser.add_argument("--replay", nargs="+", help="recorded update files or directories")
+    parser.add_argument("--workers", type=int, default=1, help="worker processes, updates split by chat")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--max-p95", type=float, help="fail when p95 latency (ms) is higher")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    if args.replay:
+        args.replay = [Path(path).resolve() for path in args.replay]
+
+    # The bot uses relative paths, so it runs in a scratch copy
+    workdir = Path(tempfile.mkdtemp(prefix="resume-bench-"))
+    shutil.copytree(ROOT / "resumes", workdir / "resumes", ignore=shutil.ignore_patterns("versions"))
+    os.chdir(workdir)
+    os.environ["ADMIN_ID"] = str(ADMIN_ID)
+
+    try:
+        if args.workers > 1:
+            result, _ = run_workers(args)
+        else:
+            import my_resume
+            logging.getLogger().setLevel(logging.WARNING)
+            result, _ = asyncio.run(run(args, my_resume))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        for name, value in result.items():
+            print(f"{name:<24}{value:>12}")
+
+    if args.max_p95 is not None and result["p95_ms"] > args.max_p95:
+        print(f"p95 {result['p95_ms']} ms > {args.max_p95} ms", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Micro-benchmark: per-update cost of rendering menus.
+
+Compares building keyboards and texts on every update (the way the handlers
+used to do it) with a lookup in the prebuilt render cache.
+
+    python benchmarks/render_benchmark.py [iterations]
+"""
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup  # noqa: E402
+
+import my_resume  # noqa: E402
+from my_resume import get_render, get_text  # noqa: E402
+
+
+def render_resume_menu_uncached(lang: str):
+    buttons = [
+        [InlineKeyboardButton(text=get_text(lang, "resume_uzb"), callback_data="resume_uzb")],
+        [InlineKeyboardButton(text=get_text(lang, "resume_eng"), callback_data="resume_eng")],
+        [InlineKeyboardButton(text=get_text(lang, "resume_rus"), callback_data="resume_rus")],
+        [InlineKeyboardButton(text=get_text(lang, "contact"), callback_data="contact")],
+        [InlineKeyboardButton(text="🌐 " + (
+            "Tilni o'zgartirish" if lang == "uz" else "Изменить язык" if lang == "ru" else "Change language"),
+                              callback_data="change_lang")]
+    ]
+    return get_text(lang, "choose_resume"), InlineKeyboardMarkup(buttons)
+
+
+def render_admin_panel_uncached(lang: str):
+    buttons = [
+        [InlineKeyboardButton(text=get_text(lang, "update_uzb"), callback_data="update_resume_uzb")],
+        [InlineKeyboardButton(text=get_text(lang, "update_eng"), callback_data="update_resume_eng")],
+        [InlineKeyboardButton(text=get_text(lang, "update_rus"), callback_data="update_resume_rus")],
+        [InlineKeyboardButton(text=get_text(lang, "statistics"), callback_data="statistics")],
+        [InlineKeyboardButton(text=get_text(lang, "users_list"), callback_data="users_list")],
+        [InlineKeyboardButton(text=get_text(lang, "send_msg"), callback_data="send_message")],
+        [InlineKeyboardButton(text=get_text(lang, "file_info"), callback_data="file_info")]
+    ]
+    return get_text(lang, "admin_panel"), InlineKeyboardMarkup(buttons)
+
+
+def render_resume_menu_cached(lang: str):
+    render = get_render(lang)
+    return render["texts"]["choose_resume"], render["resume_menu"]
+
+
+def render_admin_panel_cached(lang: str):
+    render = get_render(lang)
+    return render["texts"]["admin_panel"], render["admin_panel"]
+
+
+def bench(func, iterations: int) -> float:
+    """Return microseconds per call, best of 5 runs"""
+    langs = list(my_resume.TRANSLATIONS)
+
+    def run():
+        for i in range(iterations):
+            func(langs[i % len(langs)])
+
+    return min(timeit.repeat(run, number=1, repeat=5)) / iterations * 1e6
+
+
+def main() -> None:
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+
+    print(f"{'menu':<14}{'before (us)':>14}{'after (us)':>14}{'speedup':>10}")
+    for name, before, after in [
+        ("resume_menu", render_resume_menu_uncached, render_resume_menu_cached),
+        ("admin_panel", render_admin_panel_uncached, render_admin_panel_cached),
+    ]:
+        before_us = bench(before, iterations)
+        after_us = bench(after, iterations)
+        print(f"{name:<14}{before_us:>14.2f}{after_us:>14.3f}{before_us / after_us:>9.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""Cold start benchmark: time from process start until the bot could serve updates.
+
+Each run is a fresh interpreter in a scratch copy of the bot, which
+imports the bot, opens the database (migrations, resume bootstrap),
+builds the application with real HTTP connection pools (no network) and
+renders a first menu, which loads a translation catalog. Scenarios:
+
+    first start      python -m my_resume, no bytecode or compiled catalogs yet
+    restart (file)   python my_resume.py, which never caches the script's bytecode
+    restart (-m)     python -m my_resume with the caches of the previous start
+
+    python benchmarks/startup_benchmark.py [--runs 7] [--source DIR]
+
+--source measures another checkout of the bot (e.g. an older commit).
+"""
+import argparse
+import json
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+CHILD = r"""
+import json, sys, time
+started = time.perf_counter()
+sys.path.insert(0, ".")
+if sys.argv[1] == "file":
+    import runpy
+    bot = type(sys)("bot")
+    bot.__dict__.update(runpy.run_path("my_resume.py", run_name="startup_benchmark"))
+else:
+    import my_resume as bot
+imported = time.perf_counter()
+bot.init_database()
+bot.bootstrap_resume_versions()
+database = time.perf_counter()
+bot.build_application("123456:BENCHMARK")
+built = time.perf_counter()
+bot.get_render("uz")["resume_menu"]
+bot.get_text("uz", "welcome", name="Bench")
+rendered = time.perf_counter()
+print(json.dumps({"import": imported - started, "database": database - imported,
+                  "application": built - database, "first_render": rendered - built}))
+"""
+
+SCENARIOS = (
+    ("first start", "module", True),
+    ("restart (file)", "file", False),
+    ("restart (-m)", "module", False),
+)
+
+
+def clear_caches(workdir: Path) -> None:
+    shutil.rmtree(workdir / "__pycache__", ignore_errors=True)
+    for path in workdir.glob("locales/*.bin"):
+        path.unlink()
+
+
+def run_once(workdir: Path, mode: str) -> dict:
+    started = time.perf_counter()
+    output = subprocess.run([sys.executable, "-c", CHILD, mode], cwd=workdir, check=True,
+                            capture_output=True, text=True).stdout
+    phases = json.loads(output.strip().splitlines()[-1])
+    phases["total"] = time.perf_counter() - started
+    return phases
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--runs", type=int, default=7, help="runs per scenario (median is shown)")
+    parser.add_argument("--source", type=Path, default=ROOT, help="checkout of the bot to measure")
+    args = parser.parse_args()
+
+    workdir = Path(tempfile.mkdtemp(prefix="resume-startup-"))
+    try:
+        shutil.copyfile(args.source / "my_resume.py", workdir / "my_resume.py")
+        shutil.copytree(args.source / "resumes", workdir / "resumes", ignore=shutil.ignore_patterns("versions"))
+        if (args.source / "locales").is_dir():
+            shutil.copytree(args.source / "locales", workdir / "locales", ignore=shutil.ignore_patterns("*.bin"))
+        run_once(workdir, "module")  # creates the database
+
+        columns = ("total", "import", "database", "application", "first_render")
+        print(f"{'scenario':<16}" + "".join(f"{name + ' (ms)':>18}" for name in columns))
+        for name, mode, cold in SCENARIOS:
+            runs = []
+            for _ in range(args.runs):
+                if cold:
+                    clear_caches(workdir)
+                runs.append(run_once(workdir, mode))
+            print(f"{name:<16}" + "".join(f"{statistics.median(run[column] for run in runs) * 1000:>18.1f}"
+                                          for column in columns))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""Memory cost of hosting more bots in one process (TENANTS_DIR mode).
+
+Starts 1 and then N tenants, each in a fresh process, against a fake Bot
+API that delivers a few updates per bot through getUpdates, and reports
+the resident memory of the process once every bot has handled them. The
+difference divided by N - 1 is the cost of one more bot, compared with
+the whole process one bot used to need.
+
+    python benchmarks/tenant_memory.py [--tenants 20] [--users 20]
+"""
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import shutil
+import signal
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "benchmarks"))
+
+from load_test import FakeBotAPI, UpdateFactory  # noqa: E402
+
+
+def rss_mb() -> float:
+    """Current resident set size of this process"""
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024
+
+
+class PollingFakeBotAPI(FakeBotAPI):
+    """FakeBotAPI that also answers getUpdates, with each bot's updates delivered once"""
+
+    def __init__(self, updates: dict):
+        super().__init__()
+        self.updates = updates  # token -> [update, ...]
+
+    async def do_request(self, url, method, request_data=None, read_timeout=None, write_timeout=None,
+                         connect_timeout=None, pool_timeout=None):
+        if url.endswith("/getUpdates"):
+            token = url.split("/bot", 1)[1].split("/", 1)[0]
+            updates = self.updates.pop(token, [])
+            if not updates:
+                await asyncio.sleep(0.1)
+            return 200, json.dumps({"ok": True, "result": updates}).encode()
+        return await super().do_request(url, method, request_data, read_timeout, write_timeout,
+                                        connect_timeout, pool_timeout)
+
+
+def write_tenants(directory: Path, count: int) -> None:
+    resumes = sorted((ROOT / "resumes").glob("*.pdf"))
+    for index in range(count):
+        tenant_dir = directory / f"bot{index}"
+        tenant_dir.mkdir(parents=True)
+        shutil.copyfile(resumes[0], tenant_dir / "resume.pdf")
+        config = {"token": f"{index + 1}:BENCH", "admin_id": 1, "resume_files": {"eng": "resume.pdf"},
+                  "texts": {lang: {"welcome": f"Bot {index}, {{name}}"} for lang in ("uz", "ru", "en")}}
+        (tenant_dir / "config.json").write_text(json.dumps(config), encoding="utf-8")
+
+
+def measure(tenant_count: int, users: int, results) -> None:
+    """Run tenant_count bots in this (fresh) process and report its memory"""
+    workdir = Path(tempfile.mkdtemp(prefix="resume-tenants-"))
+    os.chdir(workdir)
+    write_tenants(workdir / "tenants", tenant_count)
+
+    import my_resume
+    logging.getLogger().setLevel(logging.WARNING)
+    my_resume.METRICS_PORT = 0
+
+    factory = UpdateFactory()
+    updates = {
+        f"{index + 1}:BENCH": [update for user_id in range(100, 100 + users)
+                               for update in (factory.message(user_id, "/start"),
+                                              factory.callback(user_id, "v1:resume:get:eng"))]
+        for index in range(tenant_count)
+    }
+    bot_api = PollingFakeBotAPI(updates)
+    my_resume.HTTPXRequest = lambda **kwargs: bot_api
+
+    async def run() -> float:
+        my_resume.tenants[:] = my_resume.load_tenants("tenants")
+        serving = asyncio.create_task(my_resume.run_tenants(my_resume.tenants))
+        expected = tenant_count * users * 5  # /start answers twice, a download three times
+        while bot_api.calls < expected and not serving.done():
+            await asyncio.sleep(0.1)
+        await asyncio.sleep(1)
+        rss = rss_mb()
+        os.kill(os.getpid(), signal.SIGINT)
+        await serving
+        return rss
+
+    try:
+        results.put(asyncio.run(run()))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--tenants", type=int, default=20, help="bots in the second run")
+    parser.add_argument("--users", type=int, default=20, help="users sending /start and a download to each bot")
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    rss = {}
+    for count in (1, args.tenants):
+        process = context.Process(target=measure, args=(count, args.users, results))
+        process.start()
+        rss[count] = results.get()
+        process.join()
+
+    print(f"{'bots':<8}{'rss (MB)':>12}")
+    for count, value in rss.items():
+        print(f"{count:<8}{value:>12.1f}")
+    print(f"per additional bot: {(rss[args.tenants] - rss[1]) / (args.tenants - 1):.2f} MB "
+          f"(one bot per process: {rss[1]:.1f} MB)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""Resident memory of the bot while more and more distinct users show up.
+
+Every user goes through the user_data path of a real update: the
+application creates the user's (and private chat's) data, the persistence
+refreshes it from SQLite, the language is set and the application later
+hands the change to the persistence. Memory is reported every --step users,
+for the bounded store and for the previous behaviour (plain dicts, kept
+forever), each in a fresh process.
+
+    python benchmarks/user_data_memory.py [--users 1000000] [--step 100000]
+
+Eviction normally spares data used in the last USER_DATA_MIN_IDLE seconds;
+the benchmark turns that off, since it sends days of traffic in minutes.
+"""
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "benchmarks"))
+
+from load_test import FakeBotAPI  # noqa: E402
+from tenant_memory import rss_mb  # noqa: E402
+
+BATCH = 500  # users whose updates are in flight at once
+
+
+def measure(bounded: bool, users: int, step: int, results) -> None:
+    """Send users through the user_data path in this (fresh) process, reporting memory every step"""
+    workdir = Path(tempfile.mkdtemp(prefix="resume-user-data-"))
+    os.chdir(workdir)
+
+    import my_resume
+    logging.getLogger().setLevel(logging.WARNING)
+    if not bounded:
+        my_resume.UserData = dict
+
+    async def run() -> list:
+        my_resume.init_database()
+        application = my_resume.build_application("123456:BENCHMARK", request=FakeBotAPI())
+        persistence = application.persistence
+        if bounded:
+            persistence.min_idle = 0
+        else:
+            persistence.max_entries = persistence.idle = float("inf")
+        await application.initialize()
+
+        async def visit(user_id: int) -> None:
+            user_data = application.user_data[user_id]
+            await persistence.refresh_user_data(user_id, user_data)
+            await persistence.refresh_chat_data(user_id, application.chat_data[user_id])
+            user_data["language"] = my_resume.LANGUAGES[user_id % len(my_resume.LANGUAGES)]
+            application.mark_data_for_update_persistence(chat_ids=user_id, user_ids=user_id)
+
+        samples = [(0, rss_mb(), 0, 0.0)]
+        started = time.perf_counter()
+        for first in range(1, users + 1, BATCH):
+            await asyncio.gather(*(visit(user_id) for user_id in range(first, min(first + BATCH, users + 1))))
+            await application.update_persistence()
+            seen = min(first + BATCH - 1, users)
+            if seen % step == 0 or seen == users:
+                await persistence.flush()
+                samples.append((seen, rss_mb(), len(application.user_data), time.perf_counter() - started))
+        await application.shutdown()
+        return samples
+
+    try:
+        results.put(asyncio.run(run()))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--users", type=int, default=1_000_000, help="distinct users")
+    parser.add_argument("--step", type=int, default=100_000, help="users between memory samples")
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    for name, bounded in (("bounded", True), ("unbounded dicts", False)):
+        process = context.Process(target=measure, args=(bounded, args.users, args.step, results))
+        process.start()
+        samples = results.get()
+        process.join()
+
+        print(f"\n{name}")
+        print(f"{'users':>10}{'rss (MB)':>12}{'held':>10}{'seconds':>10}")
+        for seen, rss, held, seconds in samples:
+            print(f"{seen:>10}{rss:>12.1f}{held:>10}{seconds:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
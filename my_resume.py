@@ -1,172 +1,548 @@
+import asyncio
+import atexit
+import contextvars
+import functools
 import logging
+import random
 import os
 import json
+import html
+import string
 import sqlite3
+import csv
+import io
+import tempfile
+import zipfile
+import re
+import math
+import bisect
+import shutil
+import hashlib
+import itertools
+import marshal
+import multiprocessing
+import signal
+import threading
+import queue
+import time
+from logging.handlers import QueueHandler, QueueListener
 from pathlib import Path
-from datetime import datetime
-from telegram import Update, InlineKeyboardMarkup, InlineKeyboardButton
-from telegram.ext import Updater, CommandHandler, CallbackQueryHandler, MessageHandler, Filters, ConversationHandler, \
-    CallbackContext
+from types import MappingProxyType
+from collections import OrderedDict
+from collections.abc import Mapping, MutableMapping
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from telegram import Bot, Update, InlineKeyboardMarkup, InlineKeyboardButton
+from telegram.error import BadRequest, Forbidden, NetworkError, RetryAfter, TimedOut
+from telegram.ext import Application, CommandHandler, CallbackQueryHandler, MessageHandler, TypeHandler, \
+    filters, ConversationHandler, ContextTypes, BasePersistence, PersistenceInput, ApplicationHandlerStop, \
+    BaseRateLimiter, BaseUpdateProcessor, Updater
+from telegram.request import BaseRequest, HTTPXRequest
 from dotenv import load_dotenv
+import httpx
 
 # Load environment variables
 load_dotenv()
 
-logging.basicConfig(
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    level=logging.INFO
-)
+# Logging: records pass through a bounded queue to a background listener thread
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")  # json or text
+LOG_QUEUE_SIZE = 10000
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "0.1"))  # share of high-volume info records kept
+LOG_SAMPLED_LOGGERS = ("httpx",)  # every request is logged at INFO
 
 logger = logging.getLogger(__name__)
 
+# Fields (user_id, update_id, handler) added to records logged while a handler runs
+_log_context = contextvars.ContextVar("log_context", default=None)
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats records as one JSON object per line"""
+
+    FIELDS = ("tenant", "user_id", "update_id", "handler", "latency_ms")
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if record.processName != "MainProcess":
+            entry["process"] = record.processName
+        for field in self.FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class LogContextFilter(logging.Filter):
+    """Copies the current handler context (and tenant, if any) onto the record"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        tenant = _current_tenant.get()
+        if tenant is not None:
+            record.tenant = tenant.name
+        context = _log_context.get()
+        if context:
+            for name, value in context.items():
+                if not hasattr(record, name):
+                    setattr(record, name, value)
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Keeps only a share of high-volume info records.
+
+    Sampled are records logged with extra={"sampled": True} and INFO or lower
+    records of LOG_SAMPLED_LOGGERS; warnings and errors always pass.
+    """
+
+    def __init__(self, rate: float = LOG_SAMPLE_RATE, loggers: tuple = LOG_SAMPLED_LOGGERS):
+        super().__init__()
+        self.rate = rate
+        self.loggers = loggers
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.INFO:
+            return True
+        if getattr(record, "sampled", False) or record.name.startswith(self.loggers):
+            return random.random() < self.rate
+        return True
+
+
+class DroppingQueueHandler(QueueHandler):
+    """QueueHandler that never blocks: records are dropped when the queue is full.
+
+    Messages are not formatted here; the listener thread merges the arguments.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Tracebacks reference frames that may change, so only they are rendered now
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def setup_logging() -> QueueListener:
+    """Route all logging through DroppingQueueHandler to a stderr listener thread"""
+    stream = logging.StreamHandler()
+    if LOG_FORMAT == "json":
+        stream.setFormatter(JsonFormatter())
+    else:
+        stream.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+
+    log_queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    handler = DroppingQueueHandler(log_queue)
+    handler.addFilter(SamplingFilter())
+    handler.addFilter(LogContextFilter())
+
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    root.setLevel(LOG_LEVEL)
+
+    listener = QueueListener(log_queue, stream, respect_handler_level=True)
+    listener.start()
+    metrics.gauge("bot_log_dropped_total", "Log records dropped because the queue was full",
+                  lambda: handler.dropped, "counter")
+    metrics.gauge("bot_log_queue", "Log records waiting for the listener", log_queue.qsize)
+    return listener
+
 # Database setup
 DB_PATH = "data/bot_database.db"
+DB_BUSY_TIMEOUT = 5.0  # seconds
+DB_CACHED_STATEMENTS = 128
 Path("data").mkdir(exist_ok=True)
 
-# Resume file paths
+# Blocking SQLite calls run on a small dedicated thread pool so they never stall
+# the event loop; each pool thread keeps one connection for its whole lifetime
+DB_WORKERS = 4
+_db_executor = ThreadPoolExecutor(max_workers=DB_WORKERS, thread_name_prefix="db")
+_db_local = threading.local()
+_db_connections = []
+_db_connections_lock = threading.Lock()
+
+# Multi-tenant hosting: every <name>/config.json in TENANTS_DIR is one bot, all
+# served by this process; each tenant keeps its data under TENANTS_DATA_DIR/<name>
+TENANTS_DIR = os.getenv("TENANTS_DIR")
+TENANTS_DATA_DIR = "data/tenants"
+
+# Update processing
+CONCURRENT_UPDATES = int(os.getenv("CONCURRENT_UPDATES", "64"))
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "32"))
+
+# Worker processes: with WORKERS > 1 the main process only receives updates and hands
+# them to worker processes by chat id, so all updates of a chat go to one worker
+WORKERS = int(os.getenv("WORKERS", "1"))
+WORKER_QUEUE_SIZE = 10000  # updates waiting for one worker; more are dropped
+WORKER_RESTART_DELAY = 1.0  # seconds, doubled while a worker keeps crashing
+WORKER_MAX_RESTART_DELAY = 60.0
+WORKER_STABLE_AFTER = 60.0  # seconds of uptime after which the restart delay is reset
+WORKER_STOP_TIMEOUT = 30.0  # seconds a worker gets to finish its queue on shutdown
+
+# Update delivery: "polling" (default) or "webhook"
+BOT_MODE = os.getenv("BOT_MODE", "polling")
+WEBHOOK_LISTEN = os.getenv("WEBHOOK_LISTEN", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8443"))
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "telegram")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET")
+WEBHOOK_URL = os.getenv("WEBHOOK_URL")  # public HTTPS base URL, e.g. https://bot.example.com (required)
+
+# Action log write-behind settings
+ACTION_LOG_BATCH_SIZE = 200
+ACTION_LOG_FLUSH_INTERVAL = 0.5  # seconds
+
+# Broadcast settings; messages are paced and retried by the outbound scheduler
+BROADCAST_WORKERS = 8
+BROADCAST_CHUNK_SIZE = 100
+BROADCAST_PROGRESS_INTERVAL = 3.0  # seconds
+
+# User profile cache: unchanged profiles are not written again, and last_activity
+# is written at most once per LAST_ACTIVITY_GRANULARITY seconds per user
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "10000"))
+USER_CACHE_TTL = 3600  # seconds
+LAST_ACTIVITY_GRANULARITY = int(os.getenv("LAST_ACTIVITY_GRANULARITY", "300"))  # seconds
+
+# Outbound Bot API scheduler: limits for message-sending calls
+OUTBOUND_RATE = 30  # requests per second across all chats
+OUTBOUND_CHAT_RATE = 1.0  # messages per second to one private chat
+OUTBOUND_GROUP_RATE = 20 / 60  # messages per second to one group
+OUTBOUND_CHAT_BURST = 3
+OUTBOUND_MAX_CHATS = 10000
+OUTBOUND_THROTTLED = ("send", "edit", "copyMessage", "forwardMessage")
+OUTBOUND_MAX_RETRIES = 3
+OUTBOUND_BACKOFF = 1.0  # seconds, doubled on every network error retry
+OUTBOUND_QUEUE_TIMEOUT = 30.0  # seconds an interactive call may wait for its turn
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BROADCAST = 10
+
+# Flood control: (pattern, tokens per second, burst) per user; the first rule whose
+# pattern matches the callback data or message text applies. The admin is exempt.
+FLOOD_LIMITS = (
+    ("^v1:resume:|^resume_", 0.1, 3),  # documents: 3 at once, then one every 10 seconds
+    ("^/", 1.0, 5),  # commands
+    ("", 2.0, 10),  # everything else
+)
+FLOOD_DUPLICATE_WINDOW = 1.0  # seconds in which a repeated identical callback is ignored
+FLOOD_MAX_ENTRIES = 10000
+
+# Callback data: "<version>:<namespace>:<action>[:<arg>...]", see CallbackRouter.
+# Bump the version when payloads change meaning, so buttons of old messages are rejected.
+CALLBACK_VERSION = "v1"
+CALLBACK_MAX_LENGTH = 64  # bytes, the Bot API limit
+
+# Admin /export of users and user actions
+EXPORT_CHUNK_SIZE = 5000  # rows fetched from SQLite at a time
+EXPORT_MAX_SIZE = 50 * 1024 * 1024  # bytes, the Bot API upload limit
+EXPORT_UPLOAD_TIMEOUT = 120  # seconds
+
+# Metrics endpoint (disabled with METRICS_PORT=0)
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9100"))
+
+# Persistence of user_data and conversation states
+PERSISTENCE_FLUSH_INTERVAL = float(os.getenv("PERSISTENCE_FLUSH_INTERVAL", "30"))  # seconds
+# user_data and chat_data held in memory: at most USER_DATA_MAX_ENTRIES entries, least
+# recently used evicted first, plus entries idle for USER_DATA_IDLE seconds. Evicted data
+# is written back and read again on the user's next update. Data used in the last
+# USER_DATA_MIN_IDLE seconds (maybe by a handler still running) is never evicted.
+USER_DATA_MAX_ENTRIES = int(os.getenv("USER_DATA_MAX_ENTRIES", "10000"))
+USER_DATA_IDLE = float(os.getenv("USER_DATA_IDLE", "3600"))
+USER_DATA_MIN_IDLE = 60
+
+# Number of days in the statistics daily breakdown
+STATS_DAYS = 7
+
+# Admin users list pagination
+USERS_PAGE_SIZE = int(os.getenv("USERS_PAGE_SIZE", "10"))
+USERS_ACTIVE_DAYS = 7
+
+# Resume types and their original files (imported as the first version)
 RESUME_FILES = {
     "resume_uzb": "resumes/Khayrullayev_resume_uzb.pdf",
     "resume_eng": "resumes/khayrullayev_resume_english.pdf",
     "resume_rus": "resumes/Khayrullayev_resume_russian.pdf"
 }
 
+# Versioned resume storage
+RESUME_VERSIONS_DIR = "resumes/versions"
+RESUME_KEEP_VERSIONS = int(os.getenv("RESUME_KEEP_VERSIONS", "5"))
+RESUME_MAX_SIZE = 20 * 1024 * 1024  # bytes, the Bot API download limit
+
 # Admin ID
 ADMIN_ID = int(os.getenv("ADMIN_ID", "0"))
 
+# Contact links
+TELEGRAM_URL = "https://t.me/xayrullayev_0820"
+LINKEDIN_URL = "https://www.linkedin.com/in/ma-murjon-khayrullayev-3b7465358/"
+
+# Language picker labels (the same in every language)
+LANGUAGE_BUTTONS = (
+    ("🇺🇿 O'zbek", "uz"),
+    ("🇷🇺 Русский", "ru"),
+    ("🇬🇧 English", "en")
+)
+
 # Conversation states
 WAITING_FOR_RESUME = 1
 WAITING_FOR_MESSAGE = 2
 
-# Analytics file
-ANALYTICS_FILE = "data/analytics.json"
-Path("data").mkdir(exist_ok=True)
+# Analytics: append-only event log segments plus a compacted snapshot
+ANALYTICS_FILE = "data/analytics.json"  # legacy format, imported once
+ANALYTICS_DIR = "data/analytics"
+ANALYTICS_COMPACT_EVERY = 10000  # events per log segment
+Path(ANALYTICS_DIR).mkdir(parents=True, exist_ok=True)
+
+# Translations: one catalog per language in locales/<lang>.json, compiled to
+# <lang>.bin on first load and loaded only when the language is first used
+LOCALES_DIR = Path(__file__).resolve().with_name("locales")
+LANGUAGES = tuple(code for _, code in LANGUAGE_BUTTONS)
+CATALOG_FORMAT = 1
+
+
+class Counter:
+    """Monotonic counter with labels"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help_text = help_text
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> list:
+        with self._lock:
+            return [(self.name, dict(key), value) for key, value in self._values.items()]
+
+
+class Histogram:
+    """Bucketed latency histogram with labels (values in seconds)"""
+
+    kind = "histogram"
+    BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+    def __init__(self, name: str, help_text: str, buckets: tuple = BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self._series = {}  # labels -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels) -> None:
+        key = tuple(sorted(labels.items()))
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    def series(self) -> dict:
+        """{labels: (count, sum, per-bucket counts)}"""
+        with self._lock:
+            return {key: (sum(series[:-1]), series[-1], series[:-1]) for key, series in self._series.items()}
+
+    def quantile(self, q: float, counts: list) -> float:
+        """Estimate a quantile from per-bucket counts by interpolating inside the bucket"""
+        total = sum(counts)
+        if not total:
+            return 0.0
+        rank = q * total
+        seen = 0
+        for index, count in enumerate(counts):
+            if count and seen + count >= rank:
+                lower = self.buckets[index - 1] if index else 0.0
+                upper = self.buckets[index] if index < len(self.buckets) else self.buckets[-1]
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+        return self.buckets[-1]
+
+    def slowest(self, label: str, limit: int = 5) -> list:
+        """[(label value, p95, count)] sorted by p95, merging series that differ in other labels"""
+        merged = {}
+        for key, (count, _, counts) in self.series().items():
+            entry = merged.setdefault(dict(key).get(label, ""), [0, [0] * len(counts)])
+            entry[0] += count
+            entry[1] = [a + b for a, b in zip(entry[1], counts)]
+
+        summary = [(name, self.quantile(0.95, counts), count) for name, (count, counts) in merged.items()]
+        return sorted(summary, key=lambda item: item[1], reverse=True)[:limit]
+
+    def samples(self) -> list:
+        samples = []
+        for key, (count, total, counts) in self.series().items():
+            labels = dict(key)
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                samples.append((f"{self.name}_bucket", {**labels, "le": "+Inf" if bound == float("inf") else bound},
+                                cumulative))
+            samples.append((f"{self.name}_count", labels, count))
+            samples.append((f"{self.name}_sum", labels, total))
+        return samples
+
+
+class CallbackMetric:
+    """Gauge or counter whose value is read when metrics are collected"""
+
+    def __init__(self, name: str, help_text: str, func, kind: str = "gauge"):
+        self.name = name
+        self.help_text = help_text
+        self.kind = kind
+        self.func = func
+
+    def samples(self) -> list:
+        try:
+            return [(self.name, {}, self.func())]
+        except Exception as e:
+            logger.debug("Metrika o'qilmadi (%s): %s", self.name, e)
+            return []
 
-# Translations
-TRANSLATIONS = {
-    "uz": {
-        "welcome": "Assalomu alaykum, {name}! 👋\n\nBu bot orqali siz mening resume bilan tanishib chiqishingiz mumkin!\n\n👉 /resume ni bosing.",
-        "select_lang": "Til tanlang / Выберите язык / Select language:",
-        "choose_resume": "Quyidagi tugmalardan birini tanlang:",
-        "resume_uzb": "📄 Resume (O'zbek)",
-        "resume_eng": "📄 Resume (English)",
-        "resume_rus": "📄 Резюме (Русский)",
-        "contact": "📞 Men bilan bog'lanish",
-        "contact_text": "📞 Men bilan bog'lanish:\n\n📧 Email: xayrullayevmamur381@gamil.com\n📱 Tel: +998 91 525 07 28\n\nQuyidagi turlardan birini tanlang:",
-        "@xayrullayev_0820": "💬 Telegram",
-        "https://www.linkedin.com/in/ma-murjon-khayrullayev-3b7465358/": "💼 LinkedIn",
-        "back": "🔙 Orqaga",
-        "downloaded": "✅ Sizga Xayrullayev Ma'murjoning resumesi yuborildi.\n\nE'tibor bilan tanishib chiqing! 👍",
-        "file_not_found": "❌ Resume fayli topilmadi.\n\nIltimos, keyinroq urinib ko'ring yoki admin bilan bog'lanishingiz.",
-        "download_error": "❌ Yuklaganda xato yuz berdi. Keyinroq urinib ko'ring.",
-        "admin_panel": "🔐 <b>Admin Panel</b>\n\nQuyidagi amallarni tanlang:",
-        "update_uzb": "📝 O'zbek resumesini yangilash",
-        "update_eng": "📝 English resumesini yangilash",
-        "update_rus": "📝 Русское резюме обновить",
-        "statistics": "📊 Statistika",
-        "users_list": "👥 Foydalanuvchilar ro'yxati",
-        "send_msg": "📤 Xabar yuborish",
-        "file_info": "📋 Fayl ma'lumotlari",
-        "upload_file": "📤 Resume faylini yuboring (PDF):",
-        "no_access": "🚫 Sizda bu buyruqni ishlatish huquqi yo'q!",
-        "no_file": "❌ Iltimos, PDF fayl yuboring!",
-        "updated": "✅ <b>Resume muvaffaqiyatli yangilandi!</b>\n\n📁 Fayl: {file}\n💾 Hajmi: {size:.2f} MB\n⏰ Vaqti: {time}",
-        "file_info_text": "📊 <b>Fayl Ma'lumotlari:</b>\n\n{files}",
-        "statistics_text": "📈 <b>Statistika:</b>\n\n👥 Jami foydalanuvchilar: {users}\n📥 Jami yuklanishlar: {downloads}\n📅 Oxirgi yangilama: {time}",
-        "send_msg_text": "📬 Barcha foydalanuvchilarga xabar yozing:",
-        "msg_sent": "✅ <b>Xabar yuborildi!</b>\n\n✔️ Muvaffaqiyatli: {success}\n❌ Xatoli: {failed}",
-        "cancelled": "❌ Bekor qilindi.",
-        "admin_msg": "📢 <b>Admin xabari:</b>\n\n{msg}",
-        "found": "✅",
-        "not_found": "❌",
-        "users_header": "👥 <b>Foydalanuvchilar ({count}):</b>\n\n",
-        "user_info": "<b>👤 {name}</b>\n   ID: {id}\n   Til: {lang}\n   Ro'yxatga olindi: {joined}\n   Oxirgi faollik: {last}\n   Ko'rgan resumeler: {views}\n\n",
-    },
-    "ru": {
-        "welcome": "Здравствуйте, {name}! 👋\n\nС помощью этого бота вы можете ознакомиться с моим резюме!\n\n👉 Нажмите /resume.",
-        "select_lang": "Выберите язык / Til tanlang / Select language:",
-        "choose_resume": "Выберите один из следующих вариантов:",
-        "resume_uzb": "📄 Резюме (Ўзбек)",
-        "resume_eng": "📄 Резюме (English)",
-        "resume_rus": "📄 Резюме (Русский)",
-        "contact": "📞 Связаться со мной",
-        "contact_text": "📞 Связаться со мной:\n\n📧 Email: xayrullayevmamur381@gamil.com\n📱 Тел: +998 91 525 07 28\n\nВыберите один из следующих вариантов:",
-        "@xayrullayev_0820": "💬 Telegram",
-        "https://www.linkedin.com/in/ma-murjon-khayrullayev-3b7465358/": "💼 LinkedIn",
-        "back": "🔙 Назад",
-        "downloaded": "✅ Резюме Мамуржон Хайруллаев отправлено вам.\n\nПожалуйста, внимательно ознакомьтесь! 👍",
-        "file_not_found": "❌ Файл резюме не найден.\n\nПожалуйста, попробуйте позже или свяжитесь с администратором.",
-        "download_error": "❌ Ошибка при скачивании. Попробуйте позже.",
-        "admin_panel": "🔐 <b>Панель администратора</b>\n\nВыберите действие:",
-        "update_uzb": "📝 Обновить резюме (Ўзбек)",
-        "update_eng": "📝 Обновить резюме (English)",
-        "update_rus": "📝 Обновить резюме (Русский)",
-        "statistics": "📊 Статистика",
-        "users_list": "👥 Список пользователей",
-        "send_msg": "📤 Отправить сообщение",
-        "file_info": "📋 Информация о файлах",
-        "upload_file": "📤 Отправьте файл резюме (PDF):",
-        "no_access": "🚫 У вас нет доступа к этой команде!",
-        "no_file": "❌ Пожалуйста, отправьте PDF файл!",
-        "updated": "✅ <b>Резюме успешно обновлено!</b>\n\n📁 Файл: {file}\n💾 Размер: {size:.2f} МБ\n⏰ Время: {time}",
-        "file_info_text": "📊 <b>Информация о файлах:</b>\n\n{files}",
-        "statistics_text": "📈 <b>Статистика:</b>\n\n👥 Всего пользователей: {users}\n📥 Всего загрузок: {downloads}\n📅 Последнее обновление: {time}",
-        "send_msg_text": "📬 Напишите сообщение для всех пользователей:",
-        "msg_sent": "✅ <b>Сообщение отправлено!</b>\n\n✔️ Успешно: {success}\n❌ Ошибок: {failed}",
-        "cancelled": "❌ Отменено.",
-        "admin_msg": "📢 <b>Сообщение администратора:</b>\n\n{msg}",
-        "found": "✅",
-        "not_found": "❌",
-        "users_header": "👥 <b>Пользователи ({count}):</b>\n\n",
-        "user_info": "<b>👤 {name}</b>\n   ID: {id}\n   Язык: {lang}\n   Зарегистрирован: {joined}\n   Последняя активность: {last}\n   Просмотренные резюме: {views}\n\n",
-    },
-    "en": {
-        "welcome": "Hello, {name}! 👋\n\nYou can view my resume through this bot!\n\n👉 Press /resume.",
-        "select_lang": "Select language / Til tanlang / Выберите язык:",
-        "choose_resume": "Choose one of the following options:",
-        "resume_uzb": "📄 Resume (O'zbek)",
-        "resume_eng": "📄 Resume (English)",
-        "resume_rus": "📄 Резюме (Русский)",
-        "contact": "📞 Contact me",
-        "contact_text": "📞 Contact me:\n\n📧 Email: xayrullayevmamur381@gamil.com\n📱 Phone: +998 91 525 07 28\n\nChoose one of the following options:",
-        "@xayrullayev_0820": "💬 Telegram",
-        "https://www.linkedin.com/in/ma-murjon-khayrullayev-3b7465358/": "💼 LinkedIn",
-        "back": "🔙 Back",
-        "downloaded": "✅ Ma'murjon Khayrullayev's resume has been sent to you.\n\nPlease review it carefully! 👍",
-        "file_not_found": "❌ Resume file not found.\n\nPlease try again later or contact the administrator.",
-        "download_error": "❌ Error while downloading. Please try again.",
-        "admin_panel": "🔐 <b>Admin Panel</b>\n\nChoose an action:",
-        "update_uzb": "📝 Update Resume (O'zbek)",
-        "update_eng": "📝 Update Resume (English)",
-        "update_rus": "📝 Update Resume (Русский)",
-        "statistics": "📊 Statistics",
-        "users_list": "👥 Users List",
-        "send_msg": "📤 Send Message",
-        "file_info": "📋 File Information",
-        "upload_file": "📤 Send resume file (PDF):",
-        "no_access": "🚫 You don't have access to this command!",
-        "no_file": "❌ Please send a PDF file!",
-        "updated": "✅ <b>Resume successfully updated!</b>\n\n📁 File: {file}\n💾 Size: {size:.2f} MB\n⏰ Time: {time}",
-        "file_info_text": "📊 <b>File Information:</b>\n\n{files}",
-        "statistics_text": "📈 <b>Statistics:</b>\n\n👥 Total users: {users}\n📥 Total downloads: {downloads}\n📅 Last update: {time}",
-        "send_msg_text": "📬 Write a message for all users:",
-        "msg_sent": "✅ <b>Message sent!</b>\n\n✔️ Successful: {success}\n❌ Errors: {failed}",
-        "cancelled": "❌ Cancelled.",
-        "admin_msg": "📢 <b>Admin message:</b>\n\n{msg}",
-        "found": "✅",
-        "not_found": "❌",
-        "users_header": "👥 <b>Users ({count}):</b>\n\n",
-        "user_info": "<b>👤 {name}</b>\n   ID: {id}\n   Language: {lang}\n   Joined: {joined}\n   Last activity: {last}\n   Viewed resumes: {views}\n\n",
-    }
-}
 
+class MetricsRegistry:
+    """Named metrics rendered in the Prometheus text exposition format"""
 
-def init_database():
-    """Initialize SQLite database"""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
+    def __init__(self):
+        self._metrics = {}
+
+    def register(self, metric):
+        # Re-registering a name (e.g. a gauge bound to a new application) replaces it
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help_text: str) -> Counter:
+        return self.register(Counter(name, help_text))
+
+    def histogram(self, name: str, help_text: str) -> Histogram:
+        return self.register(Histogram(name, help_text))
+
+    def gauge(self, name: str, help_text: str, func, kind: str = "gauge") -> CallbackMetric:
+        return self.register(CallbackMetric(name, help_text, func, kind))
+
+    @staticmethod
+    def _format_labels(labels: dict) -> str:
+        if not labels:
+            return ""
+        escaped = (
+            name + '="' + str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+            for name, value in labels.items()
+        )
+        return "{" + ",".join(escaped) + "}"
+
+    def render(self) -> str:
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.append(f"# HELP {metric.name} {metric.help_text}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{self._format_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+HANDLER_LATENCY = metrics.histogram("bot_handler_seconds", "Handler callback latency")
+API_LATENCY = metrics.histogram("bot_api_request_seconds", "Bot API request latency by method and HTTP status")
+DB_LATENCY = metrics.histogram("bot_db_query_seconds", "SQLite helper execution time")
+FILE_ID_CACHE = metrics.counter("bot_file_id_cache_total", "Resume file_id cache lookups")
+_db_pending = [0]
+metrics.gauge("bot_db_pending", "Database calls waiting for or running on the pool", lambda: _db_pending[0])
+
+
+# The tenant that the running task (or a thread started from it) works for
+_current_tenant = contextvars.ContextVar("tenant", default=None)
+
+
+def current_tenant() -> "Tenant":
+    """The tenant being served; the default tenant outside multi-tenant mode"""
+    return _current_tenant.get() or default_tenant
+
+
+def is_admin(user_id: int) -> bool:
+    """Whether the user is the admin of the current tenant"""
+    return user_id == current_tenant().admin_id
+
+
+def get_connection() -> sqlite3.Connection:
+    """Get the calling thread's shared connection to the current tenant's database"""
+    db_path = current_tenant().db_path
+    connections = getattr(_db_local, "connections", None)
+    if connections is None:
+        connections = _db_local.connections = {}
+    conn = connections.get(db_path)
+    if conn is None:
+        conn = sqlite3.connect(
+            db_path,
+            timeout=DB_BUSY_TIMEOUT,
+            cached_statements=DB_CACHED_STATEMENTS,
+            check_same_thread=False
+        )
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA busy_timeout={int(DB_BUSY_TIMEOUT * 1000)}")
+        connections[db_path] = conn
+        with _db_connections_lock:
+            _db_connections.append(conn)
+    return conn
+
+
+async def run_db(func, *args, **kwargs):
+    """Run a blocking database helper on the database thread pool (in the caller's tenant)"""
+    loop = asyncio.get_running_loop()
+    _db_pending[0] += 1
+    try:
+        return await loop.run_in_executor(_db_executor, contextvars.copy_context().run,
+                                          functools.partial(_timed_db_call, func, *args, **kwargs))
+    finally:
+        _db_pending[0] -= 1
 
+
+def _timed_db_call(func, *args, **kwargs):
+    started = time.perf_counter()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        DB_LATENCY.observe(time.perf_counter() - started, query=getattr(func, "__qualname__", repr(func)))
+
+
+def close_connections() -> None:
+    """Close all database connections opened by pool threads"""
+    with _db_connections_lock:
+        for conn in _db_connections:
+            try:
+                conn.close()
+            except Exception as e:
+                logger.error("Database error: %s", e)
+        _db_connections.clear()
+    _db_local.__dict__.pop("connections", None)
+
+
+def _migrate_initial_schema(conn: sqlite3.Connection) -> None:
     # Users table
-    cursor.execute('''
+    conn.execute('''
         CREATE TABLE IF NOT EXISTS users (
             user_id INTEGER PRIMARY KEY,
             first_name TEXT,
@@ -179,7 +555,7 @@ def init_database():
     ''')
 
     # User actions table
-    cursor.execute('''
+    conn.execute('''
         CREATE TABLE IF NOT EXISTS user_actions (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             user_id INTEGER,
@@ -190,584 +566,3512 @@ def init_database():
         )
     ''')
 
-    conn.commit()
-    conn.close()
+
+def _migrate_resume_file_cache(conn: sqlite3.Connection) -> None:
+    # Telegram file_id cache for resume documents
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS resume_file_cache (
+            resume_type TEXT PRIMARY KEY,
+            fingerprint TEXT NOT NULL,
+            file_id TEXT NOT NULL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+
+def _migrate_broadcasts(conn: sqlite3.Connection) -> None:
+    # Users who blocked the bot are skipped by broadcasts
+    _add_column_if_missing(conn, "users", "is_active", "INTEGER DEFAULT 1")
+
+    # Broadcast jobs and per-recipient delivery state
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS broadcasts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            admin_chat_id INTEGER,
+            status_message_id INTEGER,
+            language TEXT,
+            text TEXT,
+            status TEXT DEFAULT 'running',
+            total INTEGER DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            finished_at TIMESTAMP
+        )
+    ''')
+
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS broadcast_deliveries (
+            broadcast_id INTEGER,
+            user_id INTEGER,
+            status TEXT DEFAULT 'pending',
+            PRIMARY KEY (broadcast_id, user_id)
+        ) WITHOUT ROWID
+    ''')
+
+
+def _migrate_user_actions_indexes(conn: sqlite3.Connection) -> None:
+    # Download counts per user and the statistics totals filter on action first
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_user_actions_action_user ON user_actions (action, user_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_user_actions_date ON user_actions (action_date)")
+
+
+def _migrate_counters(conn: sqlite3.Connection) -> None:
+    # Materialized counters, kept up to date by triggers in the same transaction as the write
+    _add_column_if_missing(conn, "users", "download_count", "INTEGER DEFAULT 0")
+
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS stats_counters (
+            name TEXT PRIMARY KEY,
+            value INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+    ''')
+
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS stats_daily (
+            day TEXT NOT NULL,
+            action TEXT NOT NULL,
+            resume_type TEXT NOT NULL DEFAULT '',
+            count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, action, resume_type)
+        ) WITHOUT ROWID
+    ''')
+
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_users_insert AFTER INSERT ON users
+        BEGIN
+            INSERT INTO stats_counters (name, value) VALUES ('users', 1)
+                ON CONFLICT (name) DO UPDATE SET value = value + 1;
+            INSERT INTO stats_counters (name, value) VALUES ('users:lang:' || COALESCE(NEW.language, 'uz'), 1)
+                ON CONFLICT (name) DO UPDATE SET value = value + 1;
+        END
+    ''')
+
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_users_language AFTER UPDATE OF language ON users
+        WHEN OLD.language IS NOT NEW.language
+        BEGIN
+            UPDATE stats_counters SET value = value - 1
+                WHERE name = 'users:lang:' || COALESCE(OLD.language, 'uz');
+            INSERT INTO stats_counters (name, value) VALUES ('users:lang:' || COALESCE(NEW.language, 'uz'), 1)
+                ON CONFLICT (name) DO UPDATE SET value = value + 1;
+        END
+    ''')
+
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_users_delete AFTER DELETE ON users
+        BEGIN
+            UPDATE stats_counters SET value = value - 1
+                WHERE name IN ('users', 'users:lang:' || COALESCE(OLD.language, 'uz'));
+        END
+    ''')
+
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_user_actions_insert AFTER INSERT ON user_actions
+        BEGIN
+            INSERT INTO stats_counters (name, value) VALUES ('actions:' || COALESCE(NEW.action, ''), 1)
+                ON CONFLICT (name) DO UPDATE SET value = value + 1;
+            INSERT INTO stats_counters (name, value)
+                SELECT 'downloads:' || NEW.resume_type, 1
+                WHERE NEW.action = 'download' AND NEW.resume_type IS NOT NULL
+                ON CONFLICT (name) DO UPDATE SET value = value + 1;
+            INSERT INTO stats_daily (day, action, resume_type, count)
+                VALUES (date(NEW.action_date), COALESCE(NEW.action, ''), COALESCE(NEW.resume_type, ''), 1)
+                ON CONFLICT (day, action, resume_type) DO UPDATE SET count = count + 1;
+            UPDATE users SET download_count = download_count + 1
+                WHERE user_id = NEW.user_id AND NEW.action = 'download';
+        END
+    ''')
+
+    _rebuild_counters(conn)
+
+
+def _migrate_users_pagination_indexes(conn: sqlite3.Connection) -> None:
+    # Keyset pagination of the admin users list, optionally filtered by language
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_users_activity ON users (last_activity, user_id)")
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_users_language_activity ON users (language, last_activity, user_id)"
+    )
+
+
+def _migrate_persistence(conn: sqlite3.Connection) -> None:
+    # Application state (user_data, chat_data, bot_data, conversation states) as JSON
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS persistence_data (
+            kind TEXT NOT NULL,
+            key INTEGER NOT NULL,
+            data TEXT NOT NULL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (kind, key)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS persistence_conversations (
+            name TEXT NOT NULL,
+            key TEXT NOT NULL,
+            state TEXT NOT NULL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (name, key)
+        ) WITHOUT ROWID
+    ''')
+
+
+def _migrate_resume_versions(conn: sqlite3.Connection) -> None:
+    # Uploaded resume versions; exactly one row per resume type is current
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS resume_versions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            resume_type TEXT NOT NULL,
+            version INTEGER NOT NULL,
+            path TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            sha256 TEXT NOT NULL,
+            uploaded_by INTEGER,
+            uploaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            is_current INTEGER NOT NULL DEFAULT 0,
+            UNIQUE (resume_type, version),
+            UNIQUE (resume_type, sha256)
+        )
+    ''')
+    conn.execute(
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_resume_versions_current "
+        "ON resume_versions (resume_type) WHERE is_current = 1"
+    )
+
+
+def _migrate_download_count_on_insert(conn: sqlite3.Connection) -> None:
+    # Downloads logged before the user's row existed (e.g. an old button pressed
+    # before /start) were not counted by the user_actions trigger
+    conn.execute("DROP TRIGGER IF EXISTS trg_users_insert")
+    conn.execute('''
+        CREATE TRIGGER trg_users_insert AFTER INSERT ON users
+        BEGIN
+            INSERT INTO stats_counters (name, value) VALUES ('users', 1)
+                ON CONFLICT (name) DO UPDATE SET value = value + 1;
+            INSERT INTO stats_counters (name, value) VALUES ('users:lang:' || COALESCE(NEW.language, 'uz'), 1)
+                ON CONFLICT (name) DO UPDATE SET value = value + 1;
+            UPDATE users SET download_count = (
+                SELECT COUNT(*) FROM user_actions a
+                WHERE a.action = 'download' AND a.user_id = NEW.user_id
+            ) WHERE user_id = NEW.user_id;
+        END
+    ''')
+
+    conn.execute('''
+        UPDATE users SET download_count = (
+            SELECT COUNT(*) FROM user_actions a
+            WHERE a.user_id = users.user_id AND a.action = 'download'
+        )
+    ''')
+
+
+def _add_column_if_missing(conn: sqlite3.Connection, table: str, column: str, definition: str) -> None:
+    columns = [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+    if column not in columns:
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+
+# Schema migrations, applied in order at startup. Never edit a released
+# migration - append a new one with the next version number instead.
+MIGRATIONS = [
+    (1, "initial schema", _migrate_initial_schema),
+    (2, "resume file_id cache", _migrate_resume_file_cache),
+    (3, "broadcast jobs", _migrate_broadcasts),
+    (4, "user_actions indexes", _migrate_user_actions_indexes),
+    (5, "statistics counters", _migrate_counters),
+    (6, "users pagination indexes", _migrate_users_pagination_indexes),
+    (7, "application state persistence", _migrate_persistence),
+    (8, "resume versions", _migrate_resume_versions),
+    (9, "download count of users inserted after their downloads", _migrate_download_count_on_insert),
+]
+
+
+def get_schema_version(conn: sqlite3.Connection) -> int:
+    """Get the latest applied migration version"""
+    return conn.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version").fetchone()[0]
+
+
+def init_database():
+    """Initialize SQLite database and apply pending migrations"""
+    conn = get_connection()
+
+    with conn:
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS schema_version (
+                version INTEGER PRIMARY KEY,
+                description TEXT,
+                applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+
+    for version, description, migrate in MIGRATIONS:
+        if version <= get_schema_version(conn):
+            continue
+
+        with conn:
+            # IMMEDIATE takes the write lock, so only one process applies a migration
+            conn.execute("BEGIN IMMEDIATE")
+            if version <= get_schema_version(conn):
+                continue
+            migrate(conn)
+            conn.execute(
+                "INSERT INTO schema_version (version, description) VALUES (?, ?)",
+                (version, description)
+            )
+
+        logger.info("Migratsiya qo'llandi: %s - %s", version, description)
+
+
+# Counter values recomputed from the source tables
+COUNTERS_QUERY = '''
+    SELECT 'users', COUNT(*) FROM users
+    UNION ALL
+    SELECT 'users:lang:' || COALESCE(language, 'uz'), COUNT(*) FROM users
+    GROUP BY COALESCE(language, 'uz')
+    UNION ALL
+    SELECT 'actions:' || COALESCE(action, ''), COUNT(*) FROM user_actions
+    GROUP BY COALESCE(action, '')
+    UNION ALL
+    SELECT 'downloads:' || resume_type, COUNT(*) FROM user_actions
+    WHERE action = 'download' AND resume_type IS NOT NULL
+    GROUP BY resume_type
+'''
+
+DAILY_COUNTERS_QUERY = '''
+    SELECT date(action_date), COALESCE(action, ''), COALESCE(resume_type, ''), COUNT(*)
+    FROM user_actions
+    GROUP BY 1, 2, 3
+'''
+
+
+def _rebuild_counters(conn: sqlite3.Connection) -> None:
+    conn.execute("DELETE FROM stats_counters")
+    conn.execute(f"INSERT INTO stats_counters (name, value) {COUNTERS_QUERY}")
+
+    conn.execute("DELETE FROM stats_daily")
+    conn.execute(f"INSERT INTO stats_daily (day, action, resume_type, count) {DAILY_COUNTERS_QUERY}")
+
+    conn.execute('''
+        UPDATE users SET download_count = (
+            SELECT COUNT(*) FROM user_actions a
+            WHERE a.user_id = users.user_id AND a.action = 'download'
+        )
+    ''')
+
+
+def check_counters() -> int:
+    """Compare materialized counters with the source tables, return number of mismatches"""
+    conn = get_connection()
+
+    def non_zero(rows):
+        return {row[:-1]: row[-1] for row in rows if row[-1]}
+
+    expected = non_zero(conn.execute(COUNTERS_QUERY).fetchall())
+    actual = non_zero(conn.execute("SELECT name, value FROM stats_counters").fetchall())
+    mismatches = len(set(expected.items()) ^ set(actual.items()))
+
+    expected = non_zero(conn.execute(DAILY_COUNTERS_QUERY).fetchall())
+    actual = non_zero(conn.execute("SELECT day, action, resume_type, count FROM stats_daily").fetchall())
+    mismatches += len(set(expected.items()) ^ set(actual.items()))
+
+    mismatches += conn.execute('''
+        SELECT COUNT(*) FROM users
+        WHERE COALESCE(download_count, 0) != (
+            SELECT COUNT(*) FROM user_actions a
+            WHERE a.user_id = users.user_id AND a.action = 'download'
+        )
+    ''').fetchone()[0]
+
+    return mismatches
+
+
+def rebuild_counters() -> None:
+    """Recompute all materialized counters from the source tables"""
+    conn = get_connection()
+
+    with conn:
+        conn.execute("BEGIN IMMEDIATE")
+        _rebuild_counters(conn)
+
+
+class UserProfileCache:
+    """Bounded LRU/TTL cache of user profiles (name, username, language).
+
+    Also remembers when last_activity was last written for each user, so
+    activity updates can be debounced.
+    """
+
+    def __init__(self, max_size: int = USER_CACHE_SIZE, ttl: float = USER_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # user_id -> [profile, cached_at, activity_written_at]
+        self._lock = threading.Lock()
+
+    def get(self, user_id: int):
+        """Get cached (first_name, last_name, username, language) or None"""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None or time.time() - entry[1] > self.ttl:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, user_id: int, profile: tuple, activity_written_at: float = None) -> None:
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if activity_written_at is None:
+                activity_written_at = entry[2] if entry else 0.0
+            self._entries[user_id] = [profile, time.time(), activity_written_at]
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: int) -> None:
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def activity_due(self, user_id: int) -> bool:
+        """Check whether last_activity should be written now, and record it if so"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return True
+            if now - entry[2] < LAST_ACTIVITY_GRANULARITY:
+                return False
+            entry[2] = now
+            return True
+
+    def load(self, user_id: int):
+        """Get a profile, reading it from the database on a cache miss"""
+        profile = self.get(user_id)
+        if profile is not None:
+            return profile
+
+        row = get_connection().execute('''
+            SELECT first_name, last_name, username, language, last_activity
+            FROM users WHERE user_id = ?
+        ''', (user_id,)).fetchone()
+        if row is None:
+            return None
+
+        self.put(user_id, row[:4], _timestamp_to_epoch(row[4]))
+        return row[:4]
+
+    def warm(self) -> int:
+        """Load the most recently active users"""
+        rows = get_connection().execute('''
+            SELECT user_id, first_name, last_name, username, language, last_activity
+            FROM users ORDER BY last_activity DESC LIMIT ?
+        ''', (self.max_size,)).fetchall()
+
+        for row in reversed(rows):
+            self.put(row[0], row[1:5], _timestamp_to_epoch(row[5]))
+        return len(rows)
+
+
+def _timestamp_to_epoch(value: str) -> float:
+    try:
+        return datetime.strptime(value, "%Y-%m-%d %H:%M:%S").replace(tzinfo=timezone.utc).timestamp()
+    except (TypeError, ValueError):
+        return 0.0
 
 
 def add_or_update_user(user_id: int, first_name: str, last_name: str = None, username: str = None,
                        language: str = "uz"):
-    """Add or update user in database"""
+    """Add or update user in database (skipped when nothing changed)"""
+    profile = (first_name, last_name, username, language)
+    user_cache = current_tenant().user_cache
+
+    if user_cache.get(user_id) == profile and not user_cache.activity_due(user_id):
+        return
+
     try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
+        conn = get_connection()
+
+        with conn:
+            conn.execute('''
+                INSERT INTO users (user_id, first_name, last_name, username, language)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (user_id) DO UPDATE SET
+                    first_name = excluded.first_name,
+                    last_name = excluded.last_name,
+                    username = excluded.username,
+                    language = excluded.language,
+                    last_activity = CURRENT_TIMESTAMP,
+                    is_active = 1
+            ''', (user_id, first_name, last_name, username, language))
+
+        user_cache.put(user_id, profile, time.time())
+    except Exception as e:
+        logger.error("Database error: %s", e)
+
+
+class ActionLogWriter:
+    """Write-behind logger that stores user actions in batches on a background thread"""
+
+    _STOP = object()
+
+    def __init__(self, batch_size: int = ACTION_LOG_BATCH_SIZE, flush_interval: float = ACTION_LOG_FLUSH_INTERVAL):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.last_flush_latency = 0.0
+        self.last_batch_size = 0
+        self.total_written = 0
+        self._queue = queue.Queue()
+        self._thread = None
+
+    @property
+    def queue_depth(self) -> int:
+        """Number of actions waiting to be written"""
+        return self._queue.qsize()
+
+    def start(self) -> None:
+        """Start the background writer thread"""
+        if self._thread and self._thread.is_alive():
+            return
+        # The thread writes to the database of the tenant that started it
+        self._thread = threading.Thread(target=contextvars.copy_context().run, args=(self._run,),
+                                        name="action-log-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Flush pending actions and stop the writer thread"""
+        if self._thread and self._thread.is_alive():
+            self._queue.put(self._STOP)
+            self._thread.join()
+        else:
+            self._write(self._drain())
+        self._thread = None
+
+    def flush(self) -> None:
+        """Block until every queued action has been written"""
+        if self._thread and self._thread.is_alive():
+            self._queue.join()
+        else:
+            self._write(self._drain())
+
+    def enqueue(self, user_id: int, action: str, resume_type: str = None, touch: bool = True) -> None:
+        """Queue an action for writing; touch=False leaves users.last_activity as is"""
+        timestamp = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+        self._queue.put((user_id, action, resume_type, timestamp, touch))
+
+    def _drain(self) -> list:
+        items = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                return items
+            self._queue.task_done()
+            if item is not self._STOP:
+                items.append(item)
+
+    def _run(self) -> None:
+        while True:
+            received = [self._queue.get()]
+
+            deadline = time.monotonic() + self.flush_interval
+            while received[-1] is not self._STOP and len(received) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    received.append(self._queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+
+            stopping = received[-1] is self._STOP
+            batch = [item for item in received if item is not self._STOP]
+            if stopping:
+                batch.extend(self._drain())
+
+            self._write(batch)
+            for _ in received:
+                self._queue.task_done()
+
+            if stopping:
+                return
+
+    def _write(self, batch: list) -> None:
+        if not batch:
+            return
+
+        record_analytics_events(batch)
+        started = time.perf_counter()
+
+        # Only the latest activity per user needs to reach the users table
+        last_activity = {}
+        for user_id, _, _, timestamp, touch in batch:
+            if touch and timestamp > last_activity.get(user_id, ""):
+                last_activity[user_id] = timestamp
 
-        cursor.execute('''
-            INSERT OR IGNORE INTO users (user_id, first_name, last_name, username, language)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (user_id, first_name, last_name, username, language))
+        try:
+            conn = get_connection()
+
+            with conn:
+                conn.executemany('''
+                    INSERT INTO user_actions (user_id, action, resume_type, action_date)
+                    VALUES (?, ?, ?, ?)
+                ''', [item[:4] for item in batch])
+
+                conn.executemany('''
+                    UPDATE users SET last_activity = ?
+                    WHERE user_id = ?
+                ''', [(timestamp, user_id) for user_id, timestamp in last_activity.items()])
+        except Exception as e:
+            logger.error("Database error: %s", e)
+            return
 
-        cursor.execute('''
-            UPDATE users SET language = ?, last_activity = CURRENT_TIMESTAMP
-            WHERE user_id = ?
-        ''', (language, user_id))
+        self.last_flush_latency = time.perf_counter() - started
+        DB_LATENCY.observe(self.last_flush_latency, query="ActionLogWriter._write")
+        self.last_batch_size = len(batch)
+        self.total_written += len(batch)
+        logger.debug("Action log: %s ta yozuv %.1f ms da saqlandi", len(batch), self.last_flush_latency * 1000)
 
-        conn.commit()
-        conn.close()
+
+def log_user_action(user_id: int, action: str, resume_type: str = None):
+    """Queue a user action for the database and the analytics log"""
+    tenant = current_tenant()
+    tenant.action_logger.enqueue(user_id, action, resume_type, touch=tenant.user_cache.activity_due(user_id))
+
+
+def get_users_page(after: tuple = None, before: tuple = None, language: str = None,
+                   active_days: int = 0, limit: int = USERS_PAGE_SIZE):
+    """Get one page of users ordered by last activity (newest first).
+
+    Pages are addressed by the (last_activity, user_id) of the row next to them,
+    so every page costs one index range scan regardless of its position.
+    Returns (users, has_prev, has_next).
+    """
+    conditions = []
+    params = []
+
+    if language:
+        conditions.append("language = ?")
+        params.append(language)
+    if active_days:
+        conditions.append("last_activity >= datetime('now', ?)")
+        params.append(f"-{active_days} days")
+
+    if before:
+        conditions.append("(last_activity, user_id) > (?, ?)")
+        params.extend(before)
+        order = "ASC"
+    else:
+        if after:
+            conditions.append("(last_activity, user_id) < (?, ?)")
+            params.extend(after)
+        order = "DESC"
+
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+    try:
+        users = get_connection().execute(f'''
+            SELECT user_id, first_name, last_name, language,
+                   joined_date, last_activity, download_count
+            FROM users
+            {where}
+            ORDER BY last_activity {order}, user_id {order}
+            LIMIT ?
+        ''', (*params, limit + 1)).fetchall()
     except Exception as e:
-        logger.error(f"Database error: {e}")
+        logger.error("Database error: %s", e)
+        return [], False, False
 
+    has_more = len(users) > limit
+    users = users[:limit]
 
-def log_user_action(user_id: int, action: str, resume_type: str = None):
-    """Log user action in database"""
+    if before:
+        users.reverse()
+        return users, has_more, True
+    return users, after is not None, has_more
+
+
+def get_statistics() -> dict:
+    """Get statistics from the materialized counters"""
+    stats = {"counters": {}, "daily": []}
     try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
+        conn = get_connection()
+        stats["counters"] = dict(conn.execute("SELECT name, value FROM stats_counters").fetchall())
+        stats["daily"] = conn.execute('''
+            SELECT day, SUM(count) FROM stats_daily
+            WHERE action = 'download' AND day >= date('now', ?)
+            GROUP BY day ORDER BY day DESC
+        ''', (f"-{STATS_DAYS - 1} days",)).fetchall()
+    except Exception as e:
+        logger.error("Database error: %s", e)
+    return stats
+
 
-        cursor.execute('''
-            INSERT INTO user_actions (user_id, action, resume_type)
-            VALUES (?, ?, ?)
-        ''', (user_id, action, resume_type))
+def parse_export_args(args: list) -> dict:
+    """Parse /export [FROM] [TO] [ACTION[,ACTION...]] (dates as YYYY-MM-DD)"""
+    dates = []
+    actions = []
 
-        cursor.execute('''
-            UPDATE users SET last_activity = CURRENT_TIMESTAMP
-            WHERE user_id = ?
-        ''', (user_id,))
+    for arg in args:
+        try:
+            dates.append(datetime.strptime(arg, "%Y-%m-%d").strftime("%Y-%m-%d"))
+        except ValueError:
+            actions.extend(action for action in arg.split(",") if action)
+
+    if len(dates) > 2 or not all(action.isidentifier() for action in actions):
+        raise ValueError("export_usage")
+
+    return {
+        "date_from": dates[0] if dates else None,
+        # The end date is inclusive
+        "date_to": (datetime.strptime(dates[1], "%Y-%m-%d") + timedelta(days=1)).strftime("%Y-%m-%d")
+        if len(dates) > 1 else None,
+        "actions": actions,
+    }
 
-        conn.commit()
+
+def _write_csv(zip_file, name: str, cursor: sqlite3.Cursor) -> int:
+    """Stream a cursor into a CSV member of the archive, EXPORT_CHUNK_SIZE rows at a time"""
+    rows_written = 0
+    with zip_file.open(name, "w") as member, io.TextIOWrapper(member, encoding="utf-8", newline="") as text:
+        writer = csv.writer(text)
+        writer.writerow([column[0] for column in cursor.description])
+        while True:
+            rows = cursor.fetchmany(EXPORT_CHUNK_SIZE)
+            if not rows:
+                break
+            writer.writerows(rows)
+            rows_written += len(rows)
+    return rows_written
+
+
+def export_analytics(path: str, date_from: str = None, date_to: str = None, actions: list = None) -> dict:
+    """Write users.csv and user_actions.csv into a zip archive, return row counts.
+
+    Uses its own read-only connection and a single read transaction, so the
+    two files are a consistent snapshot and the database stays writable.
+    """
+    user_conditions = []
+    user_params = []
+    action_conditions = []
+    action_params = []
+
+    if date_from:
+        user_conditions.append("last_activity >= ?")
+        user_params.append(date_from)
+        action_conditions.append("action_date >= ?")
+        action_params.append(date_from)
+    if date_to:
+        user_conditions.append("joined_date < ?")
+        user_params.append(date_to)
+        action_conditions.append("action_date < ?")
+        action_params.append(date_to)
+    if actions:
+        action_conditions.append(f"action IN ({', '.join('?' * len(actions))})")
+        action_params.extend(actions)
+
+    def where(conditions: list) -> str:
+        return f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+    conn = sqlite3.connect(f"file:{current_tenant().db_path}?mode=ro", uri=True, timeout=DB_BUSY_TIMEOUT)
+    try:
+        conn.execute("BEGIN")
+        with zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED) as zip_file:
+            users = _write_csv(zip_file, "users.csv", conn.execute(f'''
+                SELECT user_id, first_name, last_name, username, language, joined_date,
+                       last_activity, is_active, download_count
+                FROM users {where(user_conditions)}
+                ORDER BY user_id
+            ''', user_params))
+            actions_written = _write_csv(zip_file, "user_actions.csv", conn.execute(f'''
+                SELECT id, user_id, action, resume_type, action_date
+                FROM user_actions {where(action_conditions)}
+                ORDER BY {"action_date, id" if date_from or date_to else "id"}
+            ''', action_params))
+        conn.rollback()
+    finally:
         conn.close()
+
+    return {"users": users, "actions": actions_written}
+
+
+RESUME_VERSION_COLUMNS = ("version", "path", "size", "sha256", "uploaded_by", "uploaded_at")
+
+
+def verify_resume_file(file_path: str) -> tuple:
+    """Check size limit and PDF magic bytes, return (size, sha256).
+
+    Raises ValueError with the translation key of the problem.
+    """
+    size = Path(file_path).stat().st_size
+    if size > RESUME_MAX_SIZE:
+        raise ValueError("file_too_large")
+
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as file:
+        if file.read(5) != b"%PDF-":
+            raise ValueError("not_pdf")
+        file.seek(0)
+        for chunk in iter(lambda: file.read(1024 * 1024), b""):
+            digest.update(chunk)
+
+    return size, digest.hexdigest()
+
+
+def _resume_version_dir(resume_type: str) -> Path:
+    path = Path(current_tenant().versions_dir) / resume_type
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def _set_current_version(conn: sqlite3.Connection, resume_type: str, version: int) -> None:
+    conn.execute("UPDATE resume_versions SET is_current = 0 WHERE resume_type = ? AND is_current = 1",
+                 (resume_type,))
+    conn.execute("UPDATE resume_versions SET is_current = 1 WHERE resume_type = ? AND version = ?",
+                 (resume_type, version))
+
+
+def _prune_resume_versions(conn: sqlite3.Connection, resume_type: str) -> list:
+    """Delete all but the newest RESUME_KEEP_VERSIONS versions, return their paths"""
+    rows = conn.execute('''
+        SELECT id, path FROM resume_versions
+        WHERE resume_type = ? AND is_current = 0
+        ORDER BY version DESC LIMIT -1 OFFSET ?
+    ''', (resume_type, max(RESUME_KEEP_VERSIONS - 1, 0))).fetchall()
+    conn.executemany("DELETE FROM resume_versions WHERE id = ?", [(row[0],) for row in rows])
+    return [row[1] for row in rows]
+
+
+def store_resume_version(resume_type: str, temp_path: str, uploaded_by: int = None) -> dict:
+    """Verify an uploaded file and make it the current version of a resume.
+
+    The file is moved into place with os.replace and becomes current in a
+    single transaction, so downloads always see a complete file.
+    """
+    try:
+        size, sha256 = verify_resume_file(temp_path)
+        final_path = _resume_version_dir(resume_type) / f"{sha256[:16]}.pdf"
+        os.replace(temp_path, final_path)
+    except BaseException:
+        Path(temp_path).unlink(missing_ok=True)
+        raise
+
+    conn = get_connection()
+
+    with conn:
+        conn.execute("BEGIN IMMEDIATE")
+        row = conn.execute(
+            "SELECT version FROM resume_versions WHERE resume_type = ? AND sha256 = ?", (resume_type, sha256)
+        ).fetchone()
+
+        if row:
+            # Same content as an older version: point back to it
+            version = row[0]
+        else:
+            version = conn.execute(
+                "SELECT COALESCE(MAX(version), 0) + 1 FROM resume_versions WHERE resume_type = ?", (resume_type,)
+            ).fetchone()[0]
+            conn.execute('''
+                INSERT INTO resume_versions (resume_type, version, path, size, sha256, uploaded_by)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', (resume_type, version, str(final_path), size, sha256, uploaded_by))
+
+        _set_current_version(conn, resume_type, version)
+        removed = _prune_resume_versions(conn, resume_type)
+
+    for path in removed:
+        Path(path).unlink(missing_ok=True)
+        logger.info("Eski resume versiyasi o'chirildi: %s", path)
+
+    return get_current_resume(resume_type)
+
+
+def rollback_resume(resume_type: str):
+    """Make the version before the current one current, return it (or None)"""
+    conn = get_connection()
+
+    with conn:
+        conn.execute("BEGIN IMMEDIATE")
+        row = conn.execute('''
+            SELECT version FROM resume_versions
+            WHERE resume_type = ? AND version < (
+                SELECT version FROM resume_versions WHERE resume_type = ? AND is_current = 1
+            )
+            ORDER BY version DESC LIMIT 1
+        ''', (resume_type, resume_type)).fetchone()
+        if row is None:
+            return None
+        _set_current_version(conn, resume_type, row[0])
+
+    return get_current_resume(resume_type)
+
+
+def get_current_resume(resume_type: str):
+    """Get metadata of the current version of a resume"""
+    row = get_connection().execute(f'''
+        SELECT {", ".join(RESUME_VERSION_COLUMNS)} FROM resume_versions
+        WHERE resume_type = ? AND is_current = 1
+    ''', (resume_type,)).fetchone()
+    return dict(zip(RESUME_VERSION_COLUMNS, row)) if row else None
+
+
+def get_resume_versions_info() -> dict:
+    """Get {resume_type: (current version metadata, number of older versions kept)}"""
+    counts = dict(get_connection().execute('''
+        SELECT resume_type, COUNT(*) FROM resume_versions AS v
+        WHERE version < (
+            SELECT version FROM resume_versions WHERE resume_type = v.resume_type AND is_current = 1
+        )
+        GROUP BY resume_type
+    ''').fetchall())
+    return {resume_type: (get_current_resume(resume_type), counts.get(resume_type, 0))
+            for resume_type in current_tenant().resume_files}
+
+
+def bootstrap_resume_versions() -> None:
+    """Import the original resume files as the first version of each type"""
+    for resume_type, file_path in current_tenant().resume_files.items():
+        has_versions = get_connection().execute(
+            "SELECT 1 FROM resume_versions WHERE resume_type = ? LIMIT 1", (resume_type,)
+        ).fetchone()
+        if has_versions or not Path(file_path).exists():
+            continue
+
+        temp_path = _resume_version_dir(resume_type) / f".import-{os.getpid()}.tmp"
+        shutil.copyfile(file_path, temp_path)
+        try:
+            store_resume_version(resume_type, str(temp_path))
+            logger.info("Resume versiyalarga import qilindi: %s", file_path)
+        except ValueError as e:
+            logger.error("Resume import xatosi (%s): %s", file_path, e)
+
+
+def get_cached_file_id(resume_type: str, fingerprint: str):
+    """Get cached Telegram file_id for the given resume version"""
+    try:
+        row = get_connection().execute('''
+            SELECT file_id FROM resume_file_cache
+            WHERE resume_type = ? AND fingerprint = ?
+        ''', (resume_type, fingerprint)).fetchone()
+        return row[0] if row else None
     except Exception as e:
-        logger.error(f"Database error: {e}")
+        logger.error("Database error: %s", e)
+        return None
 
 
-def get_all_users():
-    """Get all users with their info"""
+def save_cached_file_id(resume_type: str, fingerprint: str, file_id: str):
+    """Save Telegram file_id for the given resume version"""
     try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-
-        cursor.execute('''
-            SELECT u.user_id, u.first_name, u.last_name, u.language, 
-                   u.joined_date, u.last_activity,
-                   COUNT(a.id) as views
-            FROM users u
-            LEFT JOIN user_actions a ON u.user_id = a.user_id AND a.action = 'download'
-            GROUP BY u.user_id
-            ORDER BY u.last_activity DESC
-        ''')
+        conn = get_connection()
 
-        users = cursor.fetchall()
-        conn.close()
-        return users
+        with conn:
+            conn.execute('''
+                INSERT OR REPLACE INTO resume_file_cache (resume_type, fingerprint, file_id, updated_at)
+                VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+            ''', (resume_type, fingerprint, file_id))
+    except Exception as e:
+        logger.error("Database error: %s", e)
+
+
+def delete_cached_file_id(resume_type: str):
+    """Invalidate cached Telegram file_id for a resume"""
+    try:
+        conn = get_connection()
+
+        with conn:
+            conn.execute("DELETE FROM resume_file_cache WHERE resume_type = ?", (resume_type,))
     except Exception as e:
-        logger.error(f"Database error: {e}")
-        return []
+        logger.error("Database error: %s", e)
 
 
-def get_user_language(context: CallbackContext) -> str:
+async def send_resume_document(bot, chat_id: int, resume_type: str, resume: dict) -> None:
+    """Send resume document, reusing Telegram file_id when the file is unchanged"""
+    fingerprint = resume["sha256"]
+    file_id = await run_db(get_cached_file_id, resume_type, fingerprint)
+
+    if file_id:
+        try:
+            await bot.send_document(chat_id=chat_id, document=file_id, caption="📎 Resume")
+            FILE_ID_CACHE.inc(result="hit")
+            return
+        except BadRequest as e:
+            logger.warning("Cached file_id rad etildi (%s): %s", resume_type, e)
+            await run_db(delete_cached_file_id, resume_type)
+
+    FILE_ID_CACHE.inc(result="miss")
+    with open(resume["path"], "rb") as file:
+        message = await bot.send_document(
+            chat_id=chat_id,
+            document=file,
+            caption="📎 Resume"
+        )
+
+    if message and message.document:
+        await run_db(save_cached_file_id, resume_type, fingerprint, message.document.file_id)
+
+
+class UserData(MutableMapping):
+    """context.user_data of one user. The application keeps one per recently active
+    user, so it is kept small: the language is an index into LANGUAGES and other keys
+    (admin conversation state) live in a dict created on first use.
+    """
+
+    __slots__ = ("_language", "_extra")
+
+    def __init__(self):
+        self._language = None
+        self._extra = None
+
+    def __getitem__(self, key):
+        if key == "language" and self._language is not None:
+            return LANGUAGES[self._language]
+        if self._extra is None:
+            raise KeyError(key)
+        return self._extra[key]
+
+    def __setitem__(self, key, value) -> None:
+        if key == "language":
+            self._language = LANGUAGES.index(value) if value in LANGUAGES else None
+            if self._language is not None:
+                if self._extra and key in self._extra:
+                    del self._extra[key]
+                    if not self._extra:
+                        self._extra = None
+                return
+        if self._extra is None:
+            self._extra = {}
+        self._extra[key] = value
+
+    def __delitem__(self, key) -> None:
+        if key == "language" and self._language is not None:
+            self._language = None
+            return
+        if self._extra is None:
+            raise KeyError(key)
+        del self._extra[key]
+        if not self._extra:
+            self._extra = None
+
+    def __iter__(self):
+        if self._language is not None:
+            yield "language"
+        if self._extra:
+            yield from self._extra
+
+    def __len__(self) -> int:
+        return (self._language is not None) + len(self._extra or ())
+
+    def __repr__(self) -> str:
+        return f"UserData({dict(self)!r})"
+
+
+class SQLitePersistence(BasePersistence):
+    """Stores user_data, chat_data, bot_data and conversation states in SQLite.
+
+    User and chat data is loaded lazily on a user's (or chat's) first update
+    instead of all at startup. Only entries whose JSON changed since the last
+    write are stored, in one transaction per flush.
+
+    The application would keep the data of every user (and chat) forever, so
+    the least recently used entries over max_entries, and those idle for
+    longer than idle, are written back and dropped from it through
+    drop_user_data/drop_chat_data; PTB's matching drop call is then ignored.
+    """
+
+    def __init__(self, update_interval: float = PERSISTENCE_FLUSH_INTERVAL, max_entries: int = USER_DATA_MAX_ENTRIES,
+                 idle: float = USER_DATA_IDLE, min_idle: float = USER_DATA_MIN_IDLE):
+        super().__init__(
+            store_data=PersistenceInput(bot_data=True, chat_data=True, user_data=True, callback_data=False),
+            update_interval=update_interval
+        )
+        self.max_entries = max_entries
+        self.idle = idle
+        self.min_idle = min_idle
+        self.application = None  # set by build_application, evicted data is dropped from it
+        self.writes = 0
+        self.evictions = 0
+        self._recent = OrderedDict()  # (kind, key) -> [data held by the application, last used]
+        self._evicted = set()  # (kind, key) dropped from the application, not to be deleted
+        self._loaded = set()  # (kind, key) read from the database and held in memory
+        self._loading = {}  # (kind, key) -> task reading it
+        self._written = {}  # (kind, key) -> JSON currently in the database
+        self._pending = {}  # (kind, key) -> JSON to write, None to delete
+        self._writing = {}  # entries of the write in progress
+        self._pending_conversations = {}  # (name, key) -> JSON state, None to delete
+        self._write_task = None
+
+    @staticmethod
+    def _read(kind: str, key: int):
+        row = get_connection().execute(
+            "SELECT data FROM persistence_data WHERE kind = ? AND key = ?", (kind, key)
+        ).fetchone()
+        return row[0] if row else None
+
+    @staticmethod
+    def _read_conversations(name: str) -> list:
+        return get_connection().execute(
+            "SELECT key, state FROM persistence_conversations WHERE name = ?", (name,)
+        ).fetchall()
+
+    @staticmethod
+    def _write(entries: dict, conversations: dict) -> None:
+        conn = get_connection()
+
+        with conn:
+            conn.executemany('''
+                INSERT INTO persistence_data (kind, key, data) VALUES (?, ?, ?)
+                ON CONFLICT (kind, key) DO UPDATE SET data = excluded.data, updated_at = CURRENT_TIMESTAMP
+            ''', [(kind, key, data) for (kind, key), data in entries.items() if data is not None])
+            conn.executemany(
+                "DELETE FROM persistence_data WHERE kind = ? AND key = ?",
+                [(kind, key) for (kind, key), data in entries.items() if data is None]
+            )
+            conn.executemany('''
+                INSERT INTO persistence_conversations (name, key, state) VALUES (?, ?, ?)
+                ON CONFLICT (name, key) DO UPDATE SET state = excluded.state, updated_at = CURRENT_TIMESTAMP
+            ''', [(name, key, state) for (name, key), state in conversations.items() if state is not None])
+            conn.executemany(
+                "DELETE FROM persistence_conversations WHERE name = ? AND key = ?",
+                [(name, key) for (name, key), state in conversations.items() if state is None]
+            )
+
+    async def _load(self, kind: str, key: int, data: dict) -> None:
+        try:
+            if self._write_task is not None and ((kind, key) in self._pending or (kind, key) in self._writing):
+                # Written back when it was evicted; read it once that is stored
+                await self._write_task
+            stored = await run_db(self._read, kind, key)
+        except Exception as e:
+            logger.error("Persistence o'qish xatosi (%s %s): %s", kind, key, e)
+            return
+        finally:
+            self._loading.pop((kind, key), None)
+
+        if stored is not None:
+            self._written[(kind, key)] = stored
+        # A write-back that failed is still pending, and newer than the database
+        current = self._pending.get((kind, key), stored)
+        if current is not None:
+            for name, value in json.loads(current).items():
+                data.setdefault(name, value)
+        self._loaded.add((kind, key))
+
+    def _store(self, kind: str) -> Mapping:
+        return self.application.user_data if kind == "user" else self.application.chat_data
+
+    def _track(self, kind: str, key: int, data) -> None:
+        """Record a use of data held by the application, then evict what is over the limits"""
+        now = time.monotonic()
+        self._recent[(kind, key)] = [data, now]
+        self._recent.move_to_end((kind, key))
+        if self.application is not None:
+            self._evict(now)
+
+    def _evict(self, now: float) -> None:
+        while self._recent:
+            (kind, key), (data, used) = next(iter(self._recent.items()))
+            idle = now - used
+            if idle < self.min_idle or (len(self._recent) <= self.max_entries and idle < self.idle):
+                break
+
+            del self._recent[(kind, key)]
+            if (kind, key) in self._loaded:
+                self._stage(kind, key, data)
+            self._loaded.discard((kind, key))
+            self._written.pop((kind, key), None)
+            self._evicted.add((kind, key))
+            if kind == "user":
+                self.application.drop_user_data(key)
+            else:
+                self.application.drop_chat_data(key)
+            self.evictions += 1
+
+    def _dropped(self, kind: str, key: int) -> bool:
+        """Check whether PTB drops data because it was evicted, rather than deleted"""
+        if (kind, key) not in self._evicted:
+            return False
+        self._evicted.discard((kind, key))
+
+        data = self._store(kind).get(key)
+        if data is not None:
+            # Used again since the eviction: PTB skipped its update in favour of the drop
+            self._track(kind, key, data)
+            if (kind, key) in self._loaded:
+                self._stage(kind, key, data)
+        return True
+
+    def _update(self, kind: str, key: int, data) -> None:
+        if (kind, key) not in self._recent:
+            # Created again by a handler that was still running when it was evicted;
+            # merged with the stored data on the next refresh
+            current = self._store(kind).get(key)
+            if current is not None:
+                self._track(kind, key, current)
+        if (kind, key) in self._loaded:
+            self._stage(kind, key, data)
+
+    async def _refresh(self, kind: str, key: int, data: dict) -> None:
+        self._track(kind, key, data)
+        if (kind, key) in self._loaded:
+            return
+
+        # Concurrent updates of the same user wait for a single read
+        task = self._loading.get((kind, key))
+        if task is None:
+            task = self._loading[(kind, key)] = asyncio.ensure_future(self._load(kind, key, data))
+        await task
+
+    def _stage(self, kind: str, key: int, data) -> None:
+        try:
+            serialized = json.dumps(dict(data), sort_keys=True, ensure_ascii=False)
+        except (TypeError, ValueError) as e:
+            logger.error("Persistence: %s %s JSON ga o'girilmadi: %s", kind, key, e)
+            return
+
+        if serialized == self._written.get((kind, key), "{}"):
+            self._pending.pop((kind, key), None)
+            return
+
+        self._pending[(kind, key)] = serialized
+        self._schedule_write()
+
+    def _schedule_write(self) -> None:
+        # PTB hands over all changed entries in one pass; they are written together
+        if self._write_task is None or self._write_task.done():
+            self._write_task = asyncio.get_running_loop().create_task(self._write_pending())
+
+    async def _write_pending(self) -> None:
+        await asyncio.sleep(0)
+
+        while self._pending or self._pending_conversations:
+            entries, self._pending = self._pending, {}
+            conversations, self._pending_conversations = self._pending_conversations, {}
+
+            self._writing = entries
+            try:
+                await run_db(self._write, entries, conversations)
+            except Exception as e:
+                logger.error("Persistence yozish xatosi: %s", e)
+                for entry_key, data in entries.items():
+                    self._pending.setdefault(entry_key, data)
+                for conversation_key, state in conversations.items():
+                    self._pending_conversations.setdefault(conversation_key, state)
+                return
+            finally:
+                self._writing = {}
+
+            self.writes += 1
+            for entry_key, data in entries.items():
+                if data is None or entry_key not in self._loaded:
+                    # Deleted, or evicted since it was staged
+                    self._written.pop(entry_key, None)
+                else:
+                    self._written[entry_key] = data
+
+    async def get_user_data(self) -> dict:
+        return {}
+
+    async def get_chat_data(self) -> dict:
+        return {}
+
+    async def get_bot_data(self) -> dict:
+        stored = await run_db(self._read, "bot", 0)
+        self._loaded.add(("bot", 0))
+        if stored is None:
+            return {}
+        self._written[("bot", 0)] = stored
+        return json.loads(stored)
+
+    async def get_callback_data(self):
+        return None
+
+    async def get_conversations(self, name: str) -> dict:
+        rows = await run_db(self._read_conversations, name)
+        return {tuple(json.loads(key)): json.loads(state) for key, state in rows}
+
+    async def update_conversation(self, name: str, key: tuple, new_state) -> None:
+        state = None if new_state is None else json.dumps(new_state)
+        self._pending_conversations[(name, json.dumps(list(key)))] = state
+        self._schedule_write()
+
+    async def update_user_data(self, user_id: int, data: dict) -> None:
+        self._update("user", user_id, data)
+
+    async def update_chat_data(self, chat_id: int, data: dict) -> None:
+        self._update("chat", chat_id, data)
+
+    async def update_bot_data(self, data: dict) -> None:
+        self._stage("bot", 0, data)
+
+    async def update_callback_data(self, data) -> None:
+        pass
+
+    async def drop_user_data(self, user_id: int) -> None:
+        if self._dropped("user", user_id):
+            return
+        self._recent.pop(("user", user_id), None)
+        self._loaded.discard(("user", user_id))
+        self._pending[("user", user_id)] = None
+        self._schedule_write()
+
+    async def drop_chat_data(self, chat_id: int) -> None:
+        if self._dropped("chat", chat_id):
+            return
+        self._recent.pop(("chat", chat_id), None)
+        self._loaded.discard(("chat", chat_id))
+        self._pending[("chat", chat_id)] = None
+        self._schedule_write()
+
+    async def refresh_user_data(self, user_id: int, user_data: dict) -> None:
+        await self._refresh("user", user_id, user_data)
+
+    async def refresh_chat_data(self, chat_id: int, chat_data: dict) -> None:
+        await self._refresh("chat", chat_id, chat_data)
+
+    async def refresh_bot_data(self, bot_data: dict) -> None:
+        pass
+
+    async def flush(self) -> None:
+        if self._write_task is not None:
+            await self._write_task
+        await self._write_pending()
+
+
+class FloodControl:
+    """Per-user token buckets keyed by the first matching FLOOD_LIMITS rule,
+    plus suppression of identical callback queries sent in quick succession.
+
+    Only used from the event loop, so no locking is needed.
+    """
+
+    def __init__(self, limits: tuple = FLOOD_LIMITS, duplicate_window: float = FLOOD_DUPLICATE_WINDOW,
+                 max_entries: int = FLOOD_MAX_ENTRIES):
+        self.rules = [(re.compile(pattern), pattern, rate, burst) for pattern, rate, burst in limits]
+        self.duplicate_window = duplicate_window
+        self.max_entries = max_entries
+        self._buckets = OrderedDict()  # (user_id, pattern) -> [tokens, updated, warned_until]
+        self._recent = OrderedDict()  # (user_id, callback data, message id) -> seen at
+
+    def is_duplicate(self, key: tuple, now: float = None) -> bool:
+        """Check whether the same callback was seen within the window, and record it"""
+        now = time.monotonic() if now is None else now
+        while self._recent and now - next(iter(self._recent.values())) > self.duplicate_window:
+            self._recent.popitem(last=False)
+
+        if key in self._recent:
+            return True
+        self._recent[key] = now
+        while len(self._recent) > self.max_entries:
+            self._recent.popitem(last=False)
+        return False
+
+    def check(self, user_id: int, text: str, now: float = None) -> tuple:
+        """Take a token for the matching rule: (rule, seconds to wait or 0, warn the user)"""
+        now = time.monotonic() if now is None else now
+        for regex, pattern, rate, burst in self.rules:
+            if regex.search(text):
+                break
+        else:
+            return None, 0.0, False
+
+        bucket = self._buckets.get((user_id, pattern))
+        if bucket is None:
+            bucket = self._buckets[(user_id, pattern)] = [float(burst), now, 0.0]
+            while len(self._buckets) > self.max_entries:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end((user_id, pattern))
+            bucket[0] = min(burst, bucket[0] + (now - bucket[1]) * rate)
+            bucket[1] = now
+
+        if bucket[0] >= 1:
+            bucket[0] -= 1
+            return pattern, 0.0, False
+
+        wait = (1 - bucket[0]) / rate
+        # Tell the user once per cooldown instead of answering every rejected update
+        warn = now >= bucket[2]
+        if warn:
+            bucket[2] = now + wait
+        return pattern, wait, warn
+
+
+FLOOD_REJECTED = metrics.counter("bot_flood_rejected_total", "Updates dropped by flood control")
+
+
+async def check_flood(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Drop duplicate callbacks and updates over the user's rate limit (runs before all other handlers)"""
+    user = update.effective_user
+    if user is None or is_admin(user.id):
+        return
+
+    flood_control = current_tenant().flood_control
+    query = update.callback_query
+    if query:
+        text = query.data or ""
+        message_id = query.message.message_id if query.message else query.inline_message_id
+        if flood_control.is_duplicate((user.id, text, message_id)):
+            FLOOD_REJECTED.inc(reason="duplicate")
+            await query.answer()
+            raise ApplicationHandlerStop
+    elif update.message and update.message.text:
+        text = update.message.text
+    else:
+        return
+
+    rule, wait, warn = flood_control.check(user.id, text)
+    if not wait:
+        return
+
+    FLOOD_REJECTED.inc(reason="rate", rule=rule)
+    cooldown = get_text(get_user_language(context), "flood_wait", seconds=math.ceil(wait))
+    if query:
+        # Callback queries must always be answered, otherwise the button keeps spinning
+        await query.answer(cooldown if warn else None)
+    elif warn:
+        await update.message.reply_text(cooldown)
+    raise ApplicationHandlerStop
+
+
+async def restore_user_language(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Restore a returning user's language from the database (runs before other handlers)"""
+    user = update.effective_user
+    if user is None or context.user_data is None or "language" in context.user_data:
+        return
+
+    try:
+        profile = await run_db(current_tenant().user_cache.load, user.id)
+    except Exception as e:
+        logger.error("Database error: %s", e)
+        return
+
+    if profile and profile[3]:
+        context.user_data["language"] = profile[3]
+
+
+def get_user_language(context: ContextTypes.DEFAULT_TYPE) -> str:
     """Get user's selected language"""
     return context.user_data.get('language', 'uz')
 
 
 def get_text(language: str, key: str, **kwargs) -> str:
     """Get translated text"""
-    text = TRANSLATIONS.get(language, TRANSLATIONS['uz']).get(key, key)
+    translations = current_tenant().translations
+    text = (translations.get(language) or translations['uz']).get(key, key)
     return text.format(**kwargs) if kwargs else text
 
 
-def load_analytics() -> dict:
-    """Load analytics data"""
+def translation_errors(base: dict, texts: dict, lang: str, partial: bool = False) -> list:
+    """Keys missing from texts (unless partial) or unknown to base, and placeholders that differ"""
+    formatter = string.Formatter()
+    errors = []
+
+    missing = base.keys() - texts.keys()
+    extra = texts.keys() - base.keys()
+    if missing and not partial:
+        errors.append(f"{lang}: missing keys {sorted(missing)}")
+    if extra:
+        errors.append(f"{lang}: unknown keys {sorted(extra)}")
+
+    for key in base.keys() & texts.keys():
+        expected = {field for _, field, _, _ in formatter.parse(base[key]) if field}
+        actual = {field for _, field, _, _ in formatter.parse(texts[key]) if field}
+        if expected != actual:
+            errors.append(f"{lang}.{key}: placeholders {sorted(actual)} != {sorted(expected)}")
+    return errors
+
+
+def read_catalog(lang: str, directory: Path = LOCALES_DIR) -> dict:
+    """Read the source catalog of a language"""
+    with open(directory / f"{lang}.json", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _catalog_stamp(lang: str, directory: Path) -> tuple:
+    # A compiled catalog is checked against the default language, so it depends on both sources
+    return tuple((stat.st_mtime_ns, stat.st_size)
+                 for stat in ((directory / f"{code}.json").stat() for code in dict.fromkeys((lang, "uz"))))
+
+
+def compile_catalog(lang: str, directory: Path = LOCALES_DIR) -> dict:
+    """Check a source catalog against the default language and store it as <lang>.bin.
+
+    The compiled file is a marshal dump of the texts with the size and mtime
+    of the sources, like a .pyc; a read-only directory just skips the write.
+    """
+    stamp = _catalog_stamp(lang, directory)
+    texts = read_catalog(lang, directory)
+    errors = translation_errors(texts if lang == "uz" else read_catalog("uz", directory), texts, lang)
+    if errors:
+        raise ValueError("Invalid translations:\n" + "\n".join(errors))
+
+    path = directory / f"{lang}.bin"
+    temp_path = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
     try:
-        if Path(ANALYTICS_FILE).exists():
-            with open(ANALYTICS_FILE, 'r') as f:
-                return json.load(f)
-    except Exception as e:
-        logger.error(f"Analytics yuklaganda xato: {e}")
-    return {"downloads": 0, "users": [], "messages": []}
+        temp_path.write_bytes(marshal.dumps((CATALOG_FORMAT, stamp, texts)))
+        os.replace(temp_path, path)
+    except OSError as e:
+        logger.warning("Tarjima katalogi saqlanmadi (%s): %s", path, e)
+        temp_path.unlink(missing_ok=True)
+    return texts
+
+
+def load_catalog(lang: str, directory: Path = LOCALES_DIR) -> dict:
+    """Texts of a language from its compiled catalog, compiled again when a source changed"""
+    try:
+        with open(directory / f"{lang}.bin", "rb") as f:
+            version, stamp, texts = marshal.load(f)
+        if version == CATALOG_FORMAT and stamp == _catalog_stamp(lang, directory):
+            return texts
+    except (OSError, EOFError, ValueError, TypeError):
+        pass
+    return compile_catalog(lang, directory)
+
+
+class TranslationCatalogs(Mapping):
+    """{language: {key: text}} that loads a language's catalog when it is first used.
+
+    overrides ({language: {key: text}}) replace texts of the catalogs, e.g.
+    a tenant's own welcome text.
+    """
+
+    def __init__(self, languages: tuple = LANGUAGES, directory: Path = LOCALES_DIR, overrides: dict = None):
+        self.languages = languages
+        self.directory = directory
+        self.overrides = overrides or {}
+        self._loaded = {}
+
+    def __getitem__(self, lang: str) -> dict:
+        texts = self._loaded.get(lang)
+        if texts is None:
+            if lang not in self.languages:
+                raise KeyError(lang)
+            texts = load_catalog(lang, self.directory)
+            if lang in self.overrides:
+                texts = {**texts, **self.overrides[lang]}
+            self._loaded[lang] = texts
+        return texts
+
+    def get(self, lang: str, default=None):
+        texts = self._loaded.get(lang)
+        if texts is None:
+            return self[lang] if lang in self.languages else default
+        return texts
+
+    def __contains__(self, lang) -> bool:
+        return lang in self.languages
+
+    def __iter__(self):
+        return iter(self.languages)
+
+    def __len__(self) -> int:
+        return len(self.languages)
+
+
+TRANSLATIONS = TranslationCatalogs()
+
+
+class CallbackRoute:
+    """One callback route; args holds the allowed values of each argument (None: any value)"""
+
+    __slots__ = ("namespace", "action", "callback", "args", "admin", "conversation", "instrumented")
+
+    def __init__(self, namespace: str, action: str, callback, args: tuple, admin: bool, conversation: bool):
+        self.namespace = namespace
+        self.action = action
+        self.callback = callback
+        self.args = args
+        self.admin = admin
+        self.conversation = conversation
+        self.instrumented = False
+
+    @property
+    def label(self) -> str:
+        return f"{self.namespace}:{self.action}"
+
+
+class CallbackRouter:
+    """Routes callback queries by a dict lookup on (namespace, action).
+
+    Callback data looks like "v1:resume:get:uzb". Payloads of another
+    version, unknown routes and arguments outside the declared values are
+    answered and dropped before any handler runs, and admin-only routes are
+    checked here instead of in every handler. Payloads of the buttons used
+    before this scheme are kept as aliases, so old messages keep working.
+    """
+
+    def __init__(self, version: str = CALLBACK_VERSION):
+        self.version = version
+        self.routes = {}  # (namespace, action) -> CallbackRoute
+        self.aliases = {}  # legacy payload -> (namespace, action, args)
+
+    def add(self, namespace: str, action: str, callback, args: tuple = (), admin: bool = False,
+            conversation: bool = False) -> None:
+        """Declare a route; conversation routes are entry points of the admin conversation"""
+        args = tuple(None if values is None else frozenset(values) for values in args)
+        self.routes[(namespace, action)] = CallbackRoute(namespace, action, callback, args, admin, conversation)
+
+    def alias(self, payload: str, namespace: str, action: str, *args: str) -> None:
+        self.aliases[payload] = (namespace, action, args)
+
+    def data(self, namespace: str, action: str, *args) -> str:
+        """Build callback data for a route; only the last argument may contain ':'"""
+        payload = ":".join((self.version, namespace, action, *map(str, args)))
+        if len(payload.encode()) > CALLBACK_MAX_LENGTH:
+            raise ValueError(f"Callback data too long: {payload}")
+        return payload
+
+    def resolve(self, payload: str) -> tuple:
+        """Return (route, args, rejection reason); route is None when rejected"""
+        version, _, rest = payload.partition(":")
+        if version == self.version:
+            namespace, _, rest = rest.partition(":")
+            action, has_args, rest = rest.partition(":")
+            route = self.routes.get((namespace, action))
+            if route is None:
+                return None, (), "unknown"
+            args = tuple(rest.split(":", len(route.args) - 1)) if has_args else ()
+        elif payload in self.aliases:
+            namespace, action, args = self.aliases[payload]
+            route = self.routes[(namespace, action)]
+        else:
+            stale = version[:1] == "v" and version[1:].isdigit()
+            return None, (), "stale" if stale else "unknown"
+
+        if len(args) != len(route.args) or any(
+                values is not None and arg not in values for arg, values in zip(args, route.args)):
+            return None, (), "invalid"
+        return route, args, None
+
+    def matcher(self, conversation: bool):
+        """Pattern for a CallbackQueryHandler: matches the conversation routes, or everything else
+
+        The resolved route ends up in context.matches[0]. Rejected payloads
+        match the regular handler, so they are answered as well.
+        """
+        def match(payload: str):
+            resolved = self.resolve(payload)
+            route = resolved[0]
+            if route is None:
+                return None if conversation else resolved
+            return resolved if route.conversation == conversation else None
+
+        return match
+
+    def instrument(self, wrap) -> None:
+        """Wrap every route callback once, e.g. with latency timing labelled by route"""
+        for route in self.routes.values():
+            if not route.instrumented:
+                route.callback = wrap(route.callback, route.label)
+                route.instrumented = True
+
+    async def dispatch(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        query = update.callback_query
+        route, args, reason = context.matches[0]
+
+        if route is None:
+            CALLBACK_REJECTED.inc(reason=reason)
+            await query.answer(get_text(get_user_language(context), "stale_button"))
+            return None
 
+        if route.admin and not is_admin(query.from_user.id):
+            CALLBACK_REJECTED.inc(reason="forbidden")
+            await query.answer("🚫 Sizda bu huquq yo'q!", show_alert=True)
+            return None
 
-def save_analytics(data: dict) -> None:
-    """Save analytics data"""
+        await query.answer()
+        context.args = list(args)
+        return await route.callback(update, context)
+
+
+callback_router = CallbackRouter()
+CALLBACK_REJECTED = metrics.counter("bot_callback_rejected_total", "Callback queries dropped by the router")
+
+
+def _keyboard(*rows) -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup(tuple(tuple(row) for row in rows))
+
+
+def build_render(texts: dict, resume_files: dict = RESUME_FILES, telegram_url: str = TELEGRAM_URL,
+                 linkedin_url: str = LINKEDIN_URL) -> MappingProxyType:
+    """Prebuild the static texts and inline keyboards of one language.
+
+    Only the given resume types get buttons, and a contact link that is not
+    set is left out.
+    """
+    data = callback_router.data
+    resume_types = [name.removeprefix("resume_") for name in resume_files]
+    links = [(key, url) for key, url in (("telegram", telegram_url), ("linkedin", linkedin_url)) if url]
+
+    language_rows = [
+        [InlineKeyboardButton(text=label, callback_data=data("lang", "set", code))] for label, code in LANGUAGE_BUTTONS
+    ]
+    admin_language_rows = [
+        [InlineKeyboardButton(text=label, callback_data=data("admin", "panel", code))] for label, code in LANGUAGE_BUTTONS
+    ]
+
+    return MappingProxyType({
+        "texts": MappingProxyType(dict(texts)),
+        "language_menu": _keyboard(*language_rows),
+        "admin_language_menu": _keyboard(*admin_language_rows),
+        "change_language_menu": _keyboard(
+            *language_rows,
+            [InlineKeyboardButton(text=texts["back"], callback_data=data("menu", "back"))]
+        ),
+        "resume_menu": _keyboard(
+            *([InlineKeyboardButton(text=texts[f"resume_{name}"], callback_data=data("resume", "get", name))]
+              for name in resume_types),
+            [InlineKeyboardButton(text=texts["contact"], callback_data=data("menu", "contact"))],
+            [InlineKeyboardButton(text=texts["change_lang"], callback_data=data("menu", "language"))]
+        ),
+        "contact_menu": _keyboard(
+            *([InlineKeyboardButton(text=texts[key], url=url)] for key, url in links),
+            [InlineKeyboardButton(text=texts["back"], callback_data=data("menu", "back"))]
+        ),
+        "admin_panel": _keyboard(
+            *([InlineKeyboardButton(text=texts[f"update_{name}"], callback_data=data("admin", "upload", name))]
+              for name in resume_types),
+            [InlineKeyboardButton(text=texts["statistics"], callback_data=data("admin", "stats"))],
+            [InlineKeyboardButton(text=texts["users_list"], callback_data=data("admin", "users", "n", "*", 0, "", ""))],
+            [InlineKeyboardButton(text=texts["send_msg"], callback_data=data("admin", "message"))],
+            [InlineKeyboardButton(text=texts["file_info"], callback_data=data("admin", "files"))]
+        ),
+    })
+
+
+def get_render(language: str) -> MappingProxyType:
+    """Get prebuilt texts and keyboards for a language (built when the language is first used)"""
+    return current_tenant().render(language)
+
+
+class AnalyticsLog:
+    """Append-only analytics event log.
+
+    Events are appended as JSON lines to events.<generation>.log. Compaction
+    switches appends to the next generation, folds the older segments into
+    snapshot.json (written to a temp file and atomically renamed) and deletes
+    them. Segments older than the snapshot generation are leftovers of an
+    interrupted compaction and are ignored.
+
+    The bot only appends to it, from the action log thread. Worker processes
+    each write their own worker-<index> directory.
+    """
+
+    def __init__(self, directory: str = ANALYTICS_DIR, compact_every: int = ANALYTICS_COMPACT_EVERY):
+        self.directory = Path(directory)
+        self.compact_every = compact_every
+        self._lock = threading.Lock()
+        self._compact_lock = threading.Lock()
+        self._file = None
+        self._generation = None
+        self._segment_events = 0
+
+    @property
+    def snapshot_path(self) -> Path:
+        return self.directory / "snapshot.json"
+
+    def _segment_path(self, generation: int) -> Path:
+        return self.directory / f"events.{generation}.log"
+
+    def _read_snapshot(self) -> dict:
+        try:
+            with open(self.snapshot_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {"generation": 0, "downloads": 0, "users": [], "actions": {}}
+
+    def _segments(self, from_generation: int) -> list:
+        generations = []
+        for path in self.directory.glob("events.*.log"):
+            try:
+                generations.append(int(path.name.split(".")[1]))
+            except ValueError:
+                continue
+        return sorted(g for g in generations if g >= from_generation)
+
+    def _open(self) -> None:
+        if self._file is None:
+            generation = self._read_snapshot()["generation"]
+            segments = self._segments(generation)
+            self._generation = segments[-1] if segments else generation
+            self._file = open(self._segment_path(self._generation), "a", encoding="utf-8", buffering=1)
+            self._segment_events = 0
+
+    def append(self, events: list) -> None:
+        """Append events; cost does not depend on history size"""
+        lines = "".join(json.dumps(event, ensure_ascii=False, separators=(",", ":")) + "\n" for event in events)
+        with self._lock:
+            self._open()
+            self._file.write(lines)
+            self._segment_events += len(events)
+            compact = self._segment_events >= self.compact_every
+
+        if compact and not self._compact_lock.locked():
+            threading.Thread(target=self.compact, name="analytics-compact", daemon=True).start()
+
+    @staticmethod
+    def _fold(state: dict, users: set, event: dict) -> None:
+        action = event.get("action")
+        state["actions"][action] = state["actions"].get(action, 0) + 1
+        if action == "download":
+            state["downloads"] += 1
+        if event.get("user_id") is not None:
+            users.add(event["user_id"])
+
+    def _write_snapshot(self, state: dict) -> None:
+        tmp_path = self.snapshot_path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.snapshot_path)
+
+    def compact(self) -> None:
+        """Fold closed log segments into the snapshot"""
+        with self._compact_lock:
+            with self._lock:
+                self._open()
+                # New events go to the next segment while the old ones are folded
+                self._file.close()
+                self._generation += 1
+                self._file = open(self._segment_path(self._generation), "a", encoding="utf-8", buffering=1)
+                self._segment_events = 0
+                new_generation = self._generation
+
+            state = self._read_snapshot()
+            users = set(state["users"])
+            old_segments = [g for g in self._segments(state["generation"]) if g < new_generation]
+
+            for generation in old_segments:
+                with open(self._segment_path(generation), "r", encoding="utf-8") as f:
+                    for line in f:
+                        try:
+                            self._fold(state, users, json.loads(line))
+                        except ValueError:
+                            continue
+
+            state["users"] = sorted(users)
+            state["generation"] = new_generation
+            self._write_snapshot(state)
+
+            for generation in self._segments(0):
+                if generation < new_generation:
+                    self._segment_path(generation).unlink(missing_ok=True)
+
+            logger.info("Analytics siqildi: %s ta segment, generation %s", len(old_segments), new_generation)
+
+    def import_legacy(self, path: str = ANALYTICS_FILE) -> bool:
+        """One-time import of the old analytics.json into the event log"""
+        legacy_path = Path(path)
+        if not legacy_path.exists() or self.snapshot_path.exists() or self._segments(0):
+            return False
+
+        with open(legacy_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+
+        events = [
+            {"user_id": item.get("user_id"), "action": item.get("action"),
+             "resume_type": item.get("resume_type"), "timestamp": item.get("timestamp")}
+            for item in data.get("messages", [])
+        ]
+        downloads_in_events = sum(1 for event in events if event["action"] == "download")
+
+        # Totals that were counted without a matching event stay in the snapshot
+        self._write_snapshot({
+            "generation": 0,
+            "downloads": max(0, data.get("downloads", 0) - downloads_in_events),
+            "users": sorted(set(data.get("users", []))),
+            "actions": {}
+        })
+
+        tmp_path = self._segment_path(0).with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for event in events:
+                f.write(json.dumps(event, ensure_ascii=False, separators=(",", ":")) + "\n")
+        os.replace(tmp_path, self._segment_path(0))
+
+        legacy_path.rename(legacy_path.with_suffix(".json.imported"))
+        logger.info("Eski analytics import qilindi: %s ta hodisa", len(events))
+        return True
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file:
+                self._file.close()
+                self._file = None
+
+
+def record_analytics_events(batch: list) -> None:
+    """Append a batch of queued user actions to the analytics log (on the action log thread)"""
     try:
-        with open(ANALYTICS_FILE, 'w') as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
+        current_tenant().analytics_log.append([
+            {"user_id": user_id, "action": action, "resume_type": resume_type, "timestamp": timestamp}
+            for user_id, action, resume_type, timestamp, _ in batch
+        ])
     except Exception as e:
-        logger.error(f"Analytics saqlaganda xato: {e}")
+        logger.error("Analytics saqlaganda xato: %s", e)
+
+
+class TokenBucket:
+    """Token bucket rate limiter shared by asyncio tasks"""
+
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else rate
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        """Wait until a token is available (waiters are served in FIFO order)"""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    wait = self._paused_until - now
+                else:
+                    self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                    self._updated = now
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        return
+                    wait = (1 - self._tokens) / self.rate
+                await asyncio.sleep(wait)
+
+    def pause(self, seconds: float) -> None:
+        """Stop handing out tokens for the given time (e.g. after RetryAfter)"""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        self._tokens = 0
+
+
+class OutboundScheduler(BaseRateLimiter):
+    """Central scheduler for every Bot API call made through the application's bot.
+
+    Message-sending calls first wait for their chat's token bucket, then for
+    a global token handed out in priority order (interactive replies before
+    broadcasts, see PRIORITY_*). RetryAfter and connection errors are retried
+    with backoff.
+    """
+
+    def __init__(self, rate: float = OUTBOUND_RATE, max_retries: int = OUTBOUND_MAX_RETRIES,
+                 queue_timeout: float = OUTBOUND_QUEUE_TIMEOUT, throttled: tuple = OUTBOUND_THROTTLED):
+        self.bucket = TokenBucket(rate)
+        self.throttled = throttled  # endpoint prefixes that are rate limited
+        self.max_retries = max_retries
+        self.queue_timeout = queue_timeout
+        self.retries = 0
+        self._chat_buckets = OrderedDict()  # chat_id -> [tokens, updated]
+        self._sequence = itertools.count()
+        self._queue = None
+        self._dispatcher = None
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize() if self._queue else 0
+
+    async def initialize(self) -> None:
+        # The bot may be initialized more than once (application and updater)
+        if self._dispatcher is not None:
+            return
+        self._queue = asyncio.PriorityQueue()
+        self._dispatcher = asyncio.create_task(self._dispatch())
+
+    async def shutdown(self) -> None:
+        if self._dispatcher:
+            self._dispatcher.cancel()
+            await asyncio.gather(self._dispatcher, return_exceptions=True)
+            self._dispatcher = None
+
+        # Let requests still waiting go out unthrottled
+        while self._queue and not self._queue.empty():
+            granted = self._queue.get_nowait()[2]
+            if not granted.done():
+                granted.set_result(None)
+
+    async def _dispatch(self) -> None:
+        while True:
+            _, _, granted = await self._queue.get()
+            if granted.done():
+                continue  # the caller timed out
+            await self.bucket.acquire()
+            if not granted.done():
+                granted.set_result(None)
+
+    async def _wait_for_chat(self, chat_id: int) -> None:
+        rate = OUTBOUND_CHAT_RATE if chat_id > 0 else OUTBOUND_GROUP_RATE
+
+        while True:
+            now = time.monotonic()
+            bucket = self._chat_buckets.get(chat_id)
+            if bucket is None:
+                bucket = self._chat_buckets[chat_id] = [float(OUTBOUND_CHAT_BURST), now]
+                while len(self._chat_buckets) > OUTBOUND_MAX_CHATS:
+                    self._chat_buckets.popitem(last=False)
+            else:
+                self._chat_buckets.move_to_end(chat_id)
+                bucket[0] = min(OUTBOUND_CHAT_BURST, bucket[0] + (now - bucket[1]) * rate)
+                bucket[1] = now
+
+            if bucket[0] >= 1:
+                bucket[0] -= 1
+                return
+            await asyncio.sleep((1 - bucket[0]) / rate)
+
+    async def _acquire(self, priority: int, chat_id) -> None:
+        if isinstance(chat_id, int):
+            await self._wait_for_chat(chat_id)
+
+        granted = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((priority, next(self._sequence), granted))
+        try:
+            await granted
+        except asyncio.CancelledError:
+            granted.cancel()
+            raise
+
+    async def process_request(self, callback, args, kwargs, endpoint, data, rate_limit_args):
+        priority = PRIORITY_INTERACTIVE if rate_limit_args is None else rate_limit_args
+        throttled = endpoint.startswith(self.throttled) and self._queue is not None
+        # Broadcasts may wait as long as it takes; interactive replies give up eventually
+        timeout = self.queue_timeout if priority == PRIORITY_INTERACTIVE else None
+
+        for attempt in range(self.max_retries + 1):
+            if throttled:
+                started = time.perf_counter()
+                try:
+                    await asyncio.wait_for(self._acquire(priority, data.get("chat_id")), timeout)
+                except asyncio.TimeoutError:
+                    raise TimedOut(f"{endpoint} navbatda {timeout}s dan ko'p kutdi") from None
+                OUTBOUND_WAIT.observe(time.perf_counter() - started, priority=priority)
+
+            try:
+                return await callback(*args, **kwargs)
+            except RetryAfter as e:
+                if attempt == self.max_retries:
+                    raise
+                logger.warning("RetryAfter %ss (%s)", e.retry_after, endpoint)
+                self.bucket.pause(e.retry_after)
+                await asyncio.sleep(e.retry_after)
+            except (BadRequest, TimedOut):
+                # BadRequest won't succeed on retry; a timed out request may have
+                # reached Telegram already, so retrying could send it twice
+                raise
+            except NetworkError as e:
+                if attempt == self.max_retries:
+                    raise
+                logger.warning("%s tarmoq xatosi, qayta urinish %s: %s", endpoint, attempt + 1, e)
+                await asyncio.sleep(OUTBOUND_BACKOFF * 2 ** attempt)
+            self.retries += 1
+
+
+OUTBOUND_WAIT = metrics.histogram("bot_outbound_wait_seconds", "Time Bot API calls waited for the scheduler")
+
+
+class BroadcastManager:
+    """Persisted, rate-limited broadcast jobs sent by concurrent asyncio workers.
+
+    Every recipient is stored in broadcast_deliveries, so a job interrupted by a
+    restart continues with the users that are still pending.
+    """
+
+    def __init__(self, workers: int = BROADCAST_WORKERS):
+        self.workers = workers
+        self._stop_event = asyncio.Event()
+        self._tasks = {}
+
+    async def start(self, bot, admin_chat_id: int, text: str, language: str) -> int:
+        """Create a broadcast job for all active users and start sending it"""
+        status_message = await bot.send_message(
+            chat_id=admin_chat_id,
+            text=get_text(language, "broadcast_progress", done=0, total=0, success=0, failed=0),
+            parse_mode="HTML"
+        )
+
+        job_id, total = await run_db(self._create_job, admin_chat_id, status_message.message_id, language, text)
+        logger.info("Broadcast #%s boshlandi: %s ta foydalanuvchi", job_id, total)
+        self._spawn(bot, job_id)
+        return job_id
+
+    async def resume_pending(self, bot) -> None:
+        """Continue broadcasts that were interrupted by a restart"""
+        try:
+            rows = await run_db(
+                lambda: get_connection().execute("SELECT id FROM broadcasts WHERE status = 'running'").fetchall()
+            )
+        except Exception as e:
+            logger.error("Database error: %s", e)
+            return
+
+        for (job_id,) in rows:
+            logger.info("Broadcast #%s davom ettirilmoqda", job_id)
+            self._spawn(bot, job_id)
+
+    async def stop(self) -> None:
+        """Stop sending after the current chunk; unfinished jobs are resumed on next start"""
+        self._stop_event.set()
+        if self._tasks:
+            await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+
+    def _spawn(self, bot, job_id: int) -> None:
+        if job_id in self._tasks:
+            return
+        task = asyncio.create_task(self._run_job(bot, job_id), name=f"broadcast-{job_id}")
+        self._tasks[job_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(job_id, None))
+
+    @staticmethod
+    def _create_job(admin_chat_id: int, status_message_id: int, language: str, text: str) -> tuple:
+        conn = get_connection()
+        with conn:
+            cursor = conn.execute('''
+                INSERT INTO broadcasts (admin_chat_id, status_message_id, language, text)
+                VALUES (?, ?, ?, ?)
+            ''', (admin_chat_id, status_message_id, language, text))
+            job_id = cursor.lastrowid
+
+            cursor = conn.execute('''
+                INSERT INTO broadcast_deliveries (broadcast_id, user_id)
+                SELECT ?, user_id FROM users WHERE is_active = 1
+            ''', (job_id,))
+            conn.execute("UPDATE broadcasts SET total = ? WHERE id = ?", (cursor.rowcount, job_id))
+        return job_id, cursor.rowcount
+
+    @staticmethod
+    def _load_job(job_id: int) -> tuple:
+        conn = get_connection()
+        job = conn.execute('''
+            SELECT admin_chat_id, status_message_id, language, text, total
+            FROM broadcasts WHERE id = ?
+        ''', (job_id,)).fetchone()
+
+        counts = dict(conn.execute('''
+            SELECT status, COUNT(*) FROM broadcast_deliveries
+            WHERE broadcast_id = ? GROUP BY status
+        ''', (job_id,)).fetchall())
+        return job, counts
+
+    @staticmethod
+    def _pending_chunk(job_id: int, last_user_id: int) -> list:
+        return [row[0] for row in get_connection().execute('''
+            SELECT user_id FROM broadcast_deliveries
+            WHERE broadcast_id = ? AND status = 'pending' AND user_id > ?
+            ORDER BY user_id LIMIT ?
+        ''', (job_id, last_user_id, BROADCAST_CHUNK_SIZE))]
+
+    @staticmethod
+    def _finish_job(job_id: int) -> None:
+        conn = get_connection()
+        with conn:
+            conn.execute('''
+                UPDATE broadcasts SET status = 'done', finished_at = CURRENT_TIMESTAMP
+                WHERE id = ?
+            ''', (job_id,))
+
+    async def _run_job(self, bot, job_id: int) -> None:
+        try:
+            job, counts = await run_db(self._load_job, job_id)
+            admin_chat_id, status_message_id, language, text, total = job
+            success = counts.get("sent", 0)
+            failed = counts.get("failed", 0) + counts.get("blocked", 0)
+
+            semaphore = asyncio.Semaphore(self.workers)
+
+            async def deliver(user_id: int) -> str:
+                async with semaphore:
+                    return await self._deliver(bot, user_id, text)
+
+            last_user_id = 0
+            last_progress = time.monotonic()
+
+            while not self._stop_event.is_set():
+                user_ids = await run_db(self._pending_chunk, job_id, last_user_id)
+                if not user_ids:
+                    break
+
+                results = await asyncio.gather(*(deliver(user_id) for user_id in user_ids))
+                try:
+                    await run_db(self._save_results, job_id, list(zip(results, user_ids)))
+                except Exception as e:
+                    # The chunk stays pending, so the job continues from it on the next start
+                    logger.error("Broadcast #%s natijalari saqlanmadi, to'xtatildi: %s", job_id, e)
+                    return
+
+                success += results.count("sent")
+                failed += len(results) - results.count("sent")
+                last_user_id = user_ids[-1]
+
+                if time.monotonic() - last_progress >= BROADCAST_PROGRESS_INTERVAL:
+                    last_progress = time.monotonic()
+                    await self._edit_status(bot, admin_chat_id, status_message_id, get_text(
+                        language, "broadcast_progress", done=success + failed, total=total,
+                        success=success, failed=failed))
+
+            if self._stop_event.is_set():
+                logger.info("Broadcast #%s to'xtatildi, keyingi ishga tushishda davom etadi", job_id)
+                return
+
+            await run_db(self._finish_job, job_id)
+            await self._edit_status(bot, admin_chat_id, status_message_id,
+                                    get_text(language, "msg_sent", success=success, failed=failed))
+            logger.info("Broadcast #%s tugadi: %s ta yuborildi, %s ta xato", job_id, success, failed)
+        except Exception as e:
+            logger.error("Broadcast #%s xatosi: %s", job_id, e)
 
+    @staticmethod
+    async def _deliver(bot, user_id: int, text: str) -> str:
+        # Sent once: the scheduler already waits out rate limits, and a timed out
+        # message may have been delivered, so it is not sent again
+        try:
+            await bot.send_message(chat_id=user_id, text=text, parse_mode="HTML",
+                                   rate_limit_args=PRIORITY_BROADCAST)
+            return "sent"
+        except Forbidden:
+            return "blocked"
+        except Exception as e:
+            if isinstance(e, BadRequest) and "chat not found" in str(e).lower():
+                return "blocked"
+            logger.error("Error sending to %s: %s", user_id, e)
+            return "failed"
+
+    @staticmethod
+    def _save_results(job_id: int, results: list) -> None:
+        conn = get_connection()
+        with conn:
+            conn.executemany('''
+                UPDATE broadcast_deliveries SET status = ?
+                WHERE broadcast_id = ? AND user_id = ?
+            ''', [(status, job_id, user_id) for status, user_id in results])
+
+            conn.executemany(
+                "UPDATE users SET is_active = 0 WHERE user_id = ?",
+                [(user_id,) for status, user_id in results if status == "blocked"]
+            )
+
+        # A cached profile would let /start skip the write that reactivates the user
+        user_cache = current_tenant().user_cache
+        for status, user_id in results:
+            if status == "blocked":
+                user_cache.invalidate(user_id)
+
+    @staticmethod
+    async def _edit_status(bot, chat_id: int, message_id: int, text: str) -> None:
+        try:
+            await bot.edit_message_text(chat_id=chat_id, message_id=message_id, text=text, parse_mode="HTML")
+        except Exception as e:
+            logger.warning("Broadcast holatini yangilab bo'lmadi: %s", e)
+
+
+class Tenant:
+    """One hosted resume bot: its settings, texts, data files and in-memory state.
+
+    Every tenant has its own SQLite database, analytics log and resume
+    versions. The database thread pool, the HTTP connection pool, logging and
+    metrics are shared by all tenants of the process. Code working for a
+    tenant finds it with current_tenant().
+    """
+
+    def __init__(self, name: str, token: str = None, admin_id: int = 0, resume_files: dict = RESUME_FILES,
+                 telegram_url: str = TELEGRAM_URL, linkedin_url: str = LINKEDIN_URL, texts: dict = None,
+                 db_path: str = DB_PATH, analytics_dir: str = ANALYTICS_DIR, analytics_file: str = ANALYTICS_FILE,
+                 versions_dir: str = RESUME_VERSIONS_DIR):
+        unknown = resume_files.keys() - RESUME_FILES.keys()
+        if unknown:
+            raise ValueError(f"{name}: unknown resume types {sorted(unknown)}")
+
+        self.name = name
+        self.token = token
+        self.admin_id = admin_id
+        self.resume_files = dict(resume_files)
+        self.db_path = db_path
+        self.analytics_file = analytics_file
+        self.versions_dir = versions_dir
+        self.telegram_url = telegram_url
+        self.linkedin_url = linkedin_url
+        self.translations = TranslationCatalogs(overrides=self._check_texts(name, texts)) if texts else TRANSLATIONS
+        self._renders = {}
+
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        Path(analytics_dir).mkdir(parents=True, exist_ok=True)
+        self.user_cache = UserProfileCache()
+        self.action_logger = ActionLogWriter()
+        self.flood_control = FloodControl()
+        self.analytics_log = AnalyticsLog(analytics_dir)
+        self.broadcast_manager = BroadcastManager()
+        self.export_lock = asyncio.Lock()
+        self.application = None  # set by build_application
+
+    @staticmethod
+    def _check_texts(name: str, texts: dict) -> dict:
+        """Check the tenant's texts ({language: {key: text}}) against the default catalogs"""
+        errors = []
+        for lang, overrides in texts.items():
+            if lang not in TRANSLATIONS:
+                errors.append(f"{lang}: unknown language")
+            else:
+                errors.extend(translation_errors(TRANSLATIONS[lang], overrides, lang, partial=True))
+        if errors:
+            raise ValueError(f"{name}: invalid texts:\n" + "\n".join(errors))
+        return texts
+
+    def render(self, language: str) -> MappingProxyType:
+        """Prebuilt texts and keyboards for a language, falling back to Uzbek"""
+        render = self._renders.get(language)
+        if render is None:
+            if language not in self.translations:
+                return self.render("uz")
+            render = self._renders[language] = build_render(
+                self.translations[language], self.resume_files, self.telegram_url, self.linkedin_url)
+        return render
+
+    @classmethod
+    def from_config(cls, path: Path, data_dir: str = TENANTS_DATA_DIR) -> "Tenant":
+        """Load a tenant from <name>/config.json; resume file paths are relative to its directory.
+
+        The token is given directly ("token") or as the name of an environment
+        variable ("token_env"), so it can stay out of the config file.
+        """
+        with open(path, encoding="utf-8") as f:
+            config = json.load(f)
+
+        name = path.parent.name
+        token = config.get("token") or os.getenv(config.get("token_env", ""))
+        if not token:
+            raise ValueError(f"{name}: missing token")
+
+        tenant_data = Path(data_dir) / name
+        return cls(
+            name,
+            token=token,
+            admin_id=int(config.get("admin_id", 0)),
+            resume_files={f"resume_{resume_type}": str(path.parent / file_path)
+                          for resume_type, file_path in config.get("resume_files", {}).items()},
+            telegram_url=config.get("telegram_url"),
+            linkedin_url=config.get("linkedin_url"),
+            texts=config.get("texts"),
+            db_path=str(tenant_data / "bot_database.db"),
+            analytics_dir=str(tenant_data / "analytics"),
+            analytics_file=str(tenant_data / "analytics.json"),
+            versions_dir=str(tenant_data / "versions"),
+        )
 
-def language_selection(update: Update, context: CallbackContext) -> None:
+
+def load_tenants(directory: str) -> list:
+    """Load every <name>/config.json in the tenants directory"""
+    loaded = [Tenant.from_config(path) for path in sorted(Path(directory).glob("*/config.json"))]
+    if not loaded:
+        raise ValueError(f"No tenants in {directory}")
+    return loaded
+
+
+# The bot configured by the module settings; the only tenant unless TENANTS_DIR is set
+default_tenant = Tenant("default", admin_id=ADMIN_ID)
+tenants = [default_tenant]
+
+metrics.gauge("bot_user_cache_hits_total", "User profile cache hits",
+              lambda: sum(tenant.user_cache.hits for tenant in tenants), "counter")
+metrics.gauge("bot_user_cache_misses_total", "User profile cache misses",
+              lambda: sum(tenant.user_cache.misses for tenant in tenants), "counter")
+metrics.gauge("bot_user_cache_size", "Cached user profiles",
+              lambda: sum(len(tenant.user_cache._entries) for tenant in tenants))
+metrics.gauge("bot_user_data_entries", "user_data and chat_data entries held in memory",
+              lambda: sum(len(tenant.application.persistence._recent) for tenant in tenants if tenant.application))
+metrics.gauge("bot_user_data_evictions_total", "user_data and chat_data entries evicted from memory",
+              lambda: sum(tenant.application.persistence.evictions for tenant in tenants if tenant.application),
+              "counter")
+metrics.gauge("bot_action_log_queue", "User actions waiting to be written",
+              lambda: sum(tenant.action_logger.queue_depth for tenant in tenants))
+metrics.gauge("bot_action_log_flush_seconds", "Duration of the last action log batch",
+              lambda: max(tenant.action_logger.last_flush_latency for tenant in tenants))
+metrics.gauge("bot_broadcast_jobs", "Running broadcast jobs",
+              lambda: sum(len(tenant.broadcast_manager._tasks) for tenant in tenants))
+metrics.gauge("bot_tenants", "Bots served by this process", lambda: len(tenants))
+
+
+async def language_selection(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Show language selection"""
-    buttons = [
-        [InlineKeyboardButton(text="🇺🇿 O'zbek", callback_data="lang_uz")],
-        [InlineKeyboardButton(text="🇷🇺 Русский", callback_data="lang_ru")],
-        [InlineKeyboardButton(text="🇬🇧 English", callback_data="lang_en")]
-    ]
+    render = get_render("uz")
 
     if update.message:
-        update.message.reply_text(
-            text="Til tanlang / Выберите язык / Select language:",
-            reply_markup=InlineKeyboardMarkup(buttons)
+        await update.message.reply_text(
+            text=render["texts"]["select_lang"],
+            reply_markup=render["language_menu"]
         )
     else:
         query = update.callback_query
-        query.edit_message_text(
-            text="Til tanlang / Выберите язык / Select language:",
-            reply_markup=InlineKeyboardMarkup(buttons)
+        await query.edit_message_text(
+            text=render["texts"]["select_lang"],
+            reply_markup=render["language_menu"]
         )
 
 
-def set_language(update: Update, context: CallbackContext) -> None:
+async def set_language(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Set user language"""
     query = update.callback_query
-    query.answer()
-
-    lang_map = {
-        "lang_uz": "uz",
-        "lang_ru": "ru",
-        "lang_en": "en"
-    }
-
-    lang = lang_map.get(query.data, "uz")
+    lang = context.args[0]
     context.user_data['language'] = lang
 
     # Update user in database
     user = query.from_user
-    add_or_update_user(user.id, user.first_name, user.last_name, user.username, lang)
+    await run_db(add_or_update_user, user.id, user.first_name, user.last_name, user.username, lang)
 
-    start_func(update, context)
+    await start_func(update, context)
 
 
-def start_func(update: Update, context: CallbackContext) -> None:
+async def start_func(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Handle /start command"""
     user = update.message.from_user if update.message else update.callback_query.from_user
     lang = get_user_language(context)
 
     # Add/update user in database
-    add_or_update_user(user.id, user.first_name, user.last_name, user.username, lang)
+    await run_db(add_or_update_user, user.id, user.first_name, user.last_name, user.username, lang)
     log_user_action(user.id, "start")
 
-    logger.info(f"Yangi foydalanuvchi: {user.id} - {user.first_name} (lang: {lang})")
+    logger.info("Yangi foydalanuvchi: %s - %s (lang: %s)", user.id, user.first_name, lang, extra={"sampled": True})
 
     text = get_text(lang, "welcome", name=user.first_name)
 
     if update.message:
-        update.message.reply_text(text=text)
-        language_selection(update, context)
+        await update.message.reply_text(text=text)
+        await language_selection(update, context)
     else:
         query = update.callback_query
-        query.edit_message_text(text=text)
-        resume_menu(update, context)
+        await query.edit_message_text(text=text)
+        await resume_menu(update, context)
 
 
-def resume_menu(update: Update, context: CallbackContext) -> None:
+async def resume_menu(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Handle /resume command"""
-    lang = get_user_language(context)
-
-    buttons = [
-        [InlineKeyboardButton(text=get_text(lang, "resume_uzb"), callback_data="resume_uzb")],
-        [InlineKeyboardButton(text=get_text(lang, "resume_eng"), callback_data="resume_eng")],
-        [InlineKeyboardButton(text=get_text(lang, "resume_rus"), callback_data="resume_rus")],
-        [InlineKeyboardButton(text=get_text(lang, "contact"), callback_data="contact")],
-        [InlineKeyboardButton(text="🌐 " + (
-            "Tilni o'zgartirish" if lang == "uz" else "Изменить язык" if lang == "ru" else "Change language"),
-                              callback_data="change_lang")]
-    ]
+    render = get_render(get_user_language(context))
 
     if update.message:
-        update.message.reply_text(
-            text=get_text(lang, "choose_resume"),
-            reply_markup=InlineKeyboardMarkup(buttons)
+        await update.message.reply_text(
+            text=render["texts"]["choose_resume"],
+            reply_markup=render["resume_menu"]
         )
     else:
         query = update.callback_query
-        query.edit_message_text(
-            text=get_text(lang, "choose_resume"),
-            reply_markup=InlineKeyboardMarkup(buttons)
+        await query.edit_message_text(
+            text=render["texts"]["choose_resume"],
+            reply_markup=render["resume_menu"]
         )
 
 
-def download_resume(update: Update, context: CallbackContext) -> None:
+async def download_resume(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Handle resume download requests"""
     query = update.callback_query
-    query.answer()
     lang = get_user_language(context)
+    resume_type = f"resume_{context.args[0]}"
 
-    resume_type = query.data
+    resume = await run_db(get_current_resume, resume_type)
 
-    if resume_type not in RESUME_FILES:
-        query.edit_message_text(text="❌ Xato yuz berdi!")
-        return
-
-    file_path = RESUME_FILES[resume_type]
-
-    if not Path(file_path).exists():
-        logger.error(f"Resume file not found: {file_path}")
-        query.edit_message_text(text=get_text(lang, "file_not_found"))
+    if resume is None:
+        logger.error("Resume file not found: %s", resume_type)
+        await query.edit_message_text(text=get_text(lang, "file_not_found"))
         return
 
     try:
-        with open(file_path, "rb") as file:
-            context.bot.send_document(
-                chat_id=query.message.chat_id,
-                document=file,
-                caption="📎 Resume"
-            )
+        await send_resume_document(context.bot, query.message.chat_id, resume_type, resume)
 
         log_user_action(query.from_user.id, "download", resume_type)
-        query.edit_message_text(text=get_text(lang, "downloaded"))
+        await query.edit_message_text(text=get_text(lang, "downloaded"))
 
+    except FileNotFoundError:
+        logger.error("Resume file not found: %s", resume['path'])
+        await query.edit_message_text(text=get_text(lang, "file_not_found"))
     except Exception as e:
-        logger.error(f"Error sending resume: {e}")
-        query.edit_message_text(text=get_text(lang, "download_error"))
+        logger.error("Error sending resume: %s", e)
+        await query.edit_message_text(text=get_text(lang, "download_error"))
 
 
-def contact_handler(update: Update, context: CallbackContext) -> None:
+async def contact_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Handle contact requests"""
     query = update.callback_query
-    query.answer()
-    lang = get_user_language(context)
-
-    buttons = [
-        [InlineKeyboardButton(text=get_text(lang, "telegram"), url="https://t.me/xayrullayev_0820")],
-        [InlineKeyboardButton(text=get_text(lang, "linkedin"), url="https://www.linkedin.com/in/ma-murjon-khayrullayev-3b7465358/")],
-        [InlineKeyboardButton(text=get_text(lang, "back"), callback_data="back_menu")]
-    ]
+    render = get_render(get_user_language(context))
 
-    query.edit_message_text(
-        text=get_text(lang, "contact_text"),
-        reply_markup=InlineKeyboardMarkup(buttons)
+    await query.edit_message_text(
+        text=render["texts"]["contact_text"],
+        reply_markup=render["contact_menu"]
     )
 
 
-def back_to_menu(update: Update, context: CallbackContext) -> None:
+async def back_to_menu(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Go back to main menu"""
-    query = update.callback_query
-    query.answer()
-    resume_menu(update, context)
+    await resume_menu(update, context)
 
 
-def change_language_menu(update: Update, context: CallbackContext) -> None:
+async def change_language_menu(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Show language change menu"""
     query = update.callback_query
-    query.answer()
-
-    buttons = [
-        [InlineKeyboardButton(text="🇺🇿 O'zbek", callback_data="lang_uz")],
-        [InlineKeyboardButton(text="🇷🇺 Русский", callback_data="lang_ru")],
-        [InlineKeyboardButton(text="🇬🇧 English", callback_data="lang_en")],
-        [InlineKeyboardButton(text="🔙 " + (
-            "Orqaga" if get_user_language(context) == "uz" else "Назад" if get_user_language(
-                context) == "ru" else "Back"), callback_data="back_menu")]
-    ]
+    render = get_render(get_user_language(context))
 
-    query.edit_message_text(
-        text="Til tanlang / Выберите язык / Select language:",
-        reply_markup=InlineKeyboardMarkup(buttons)
+    await query.edit_message_text(
+        text=get_render("uz")["texts"]["select_lang"],
+        reply_markup=render["change_language_menu"]
     )
 
 
-def admin_panel(update: Update, context: CallbackContext) -> None:
+async def admin_panel(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Show admin panel"""
-    if update.message.from_user.id != ADMIN_ID:
-        update.message.reply_text("🚫 Sizda bu buyruqni ishlatish huquqi yo'q!")
+    if not is_admin(update.message.from_user.id):
+        await update.message.reply_text("🚫 Sizda bu buyruqni ishlatish huquqi yo'q!")
         return
 
-    buttons = [
-        [InlineKeyboardButton(text="🇺🇿 O'zbek", callback_data="lang_admin_uz")],
-        [InlineKeyboardButton(text="🇷🇺 Русский", callback_data="lang_admin_ru")],
-        [InlineKeyboardButton(text="🇬🇧 English", callback_data="lang_admin_en")]
-    ]
-    update.message.reply_text(
-        text="Til tanlang / Выберите язык / Select language:",
-        reply_markup=InlineKeyboardMarkup(buttons)
+    render = get_render("uz")
+    await update.message.reply_text(
+        text=render["texts"]["select_lang"],
+        reply_markup=render["admin_language_menu"]
     )
 
 
-def show_admin_panel(update: Update, context: CallbackContext) -> None:
-    """Show admin panel after language selection"""
-    query = update.callback_query
-    query.answer()
+async def recount_statistics(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Check materialized statistics counters and rebuild them if they drifted"""
+    if not is_admin(update.message.from_user.id):
+        await update.message.reply_text("🚫 Sizda bu buyruqni ishlatish huquqi yo'q!")
+        return
 
-    lang_map = {
-        "lang_admin_uz": "uz",
-        "lang_admin_ru": "ru",
-        "lang_admin_en": "en"
-    }
+    lang = get_user_language(context)
+
+    # Pending actions must reach the database before comparing
+    await run_db(current_tenant().action_logger.flush)
+
+    mismatches = await run_db(check_counters)
+    if mismatches:
+        await run_db(rebuild_counters)
+        logger.warning("Statistika hisoblagichlari qayta hisoblandi: %s ta farq", mismatches)
+        await update.message.reply_text(get_text(lang, "counters_rebuilt", count=mismatches))
+    else:
+        await update.message.reply_text(get_text(lang, "counters_ok"))
+
+
+async def export_data(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Send users and user actions as a zipped CSV export"""
+    if not is_admin(update.message.from_user.id):
+        await update.message.reply_text("🚫 Sizda bu buyruqni ishlatish huquqi yo'q!")
+        return
+
+    lang = get_user_language(context)
+
+    try:
+        export_filters = parse_export_args(context.args or [])
+    except ValueError:
+        await update.message.reply_text(get_text(lang, "export_usage"))
+        return
+
+    tenant = current_tenant()
+    if tenant.export_lock.locked():
+        await update.message.reply_text(get_text(lang, "export_busy"))
+        return
+
+    async with tenant.export_lock:
+        await update.message.reply_text(get_text(lang, "export_started"))
+        await run_db(tenant.action_logger.flush)
 
-    lang = lang_map.get(query.data, "uz")
+        fd, path = tempfile.mkstemp(prefix="export-", suffix=".zip")
+        os.close(fd)
+        try:
+            # A thread of its own, so a long export doesn't hold a database pool worker
+            counts = await asyncio.to_thread(export_analytics, path, **export_filters)
+            size = Path(path).stat().st_size
+            if size > EXPORT_MAX_SIZE:
+                await update.message.reply_text(get_text(lang, "export_too_large", size=size / (1024 * 1024)))
+                return
+
+            with open(path, "rb") as file:
+                await context.bot.send_document(
+                    chat_id=update.message.chat_id,
+                    document=file,
+                    filename=f"export_{datetime.now().strftime('%Y%m%d_%H%M')}.zip",
+                    caption=get_text(lang, "export_done", **counts),
+                    write_timeout=EXPORT_UPLOAD_TIMEOUT
+                )
+            logger.info("Eksport yuborildi: %s ta foydalanuvchi, %s ta amal, %s bayt",
+                        counts["users"], counts["actions"], size)
+        except Exception as e:
+            logger.error("Eksport xatosi: %s", e)
+            await update.message.reply_text(f"❌ {str(e)}")
+        finally:
+            Path(path).unlink(missing_ok=True)
+
+
+async def show_admin_panel(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Show admin panel after language selection"""
+    query = update.callback_query
+    lang = context.args[0]
     context.user_data['language'] = lang
 
-    buttons = [
-        [InlineKeyboardButton(text=get_text(lang, "update_uzb"), callback_data="update_resume_uzb")],
-        [InlineKeyboardButton(text=get_text(lang, "update_eng"), callback_data="update_resume_eng")],
-        [InlineKeyboardButton(text=get_text(lang, "update_rus"), callback_data="update_resume_rus")],
-        [InlineKeyboardButton(text=get_text(lang, "statistics"), callback_data="statistics")],
-        [InlineKeyboardButton(text=get_text(lang, "users_list"), callback_data="users_list")],
-        [InlineKeyboardButton(text=get_text(lang, "send_msg"), callback_data="send_message")],
-        [InlineKeyboardButton(text=get_text(lang, "file_info"), callback_data="file_info")]
-    ]
-    query.edit_message_text(
-        text=get_text(lang, "admin_panel"),
+    render = get_render(lang)
+    await query.edit_message_text(
+        text=render["texts"]["admin_panel"],
         parse_mode="HTML",
-        reply_markup=InlineKeyboardMarkup(buttons)
+        reply_markup=render["admin_panel"]
     )
 
 
-def show_users_list(update: Update, context: CallbackContext) -> None:
-    """Show users list"""
+async def show_users_list(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Show one page of the users list.
+
+    Arguments: <n(ext)/p(rev)>, <language or *>, <active days>, <user_id>, <last_activity>
+    """
     query = update.callback_query
-    query.answer()
     lang = get_user_language(context)
 
-    users = get_all_users()
+    direction, language, active_days, user_id, last_activity = context.args
+    active_days = int(active_days)
+    cursor = (last_activity, int(user_id)) if user_id else None
 
-    if not users:
-        query.edit_message_text(text="❌ Foydalanuvchilar topilmadi")
-        return
+    users, has_prev, has_next = await run_db(
+        get_users_page,
+        after=cursor if direction == "n" else None,
+        before=cursor if direction == "p" else None,
+        language=None if language == "*" else language,
+        active_days=active_days
+    )
+
+    def page_data(page_direction, page_language=language, page_days=active_days, row=None):
+        if row is None:
+            return callback_router.data("admin", "users", "n", page_language, page_days, "", "")
+        return callback_router.data("admin", "users", page_direction, page_language, page_days, row[0], row[5])
+
+    def mark(text, selected):
+        return f"✓ {text}" if selected else text
+
+    buttons = []
+    navigation = []
+    if has_prev:
+        navigation.append(InlineKeyboardButton(text=get_text(lang, "prev_page"), callback_data=page_data("p", row=users[0])))
+    if has_next:
+        navigation.append(InlineKeyboardButton(text=get_text(lang, "next_page"), callback_data=page_data("n", row=users[-1])))
+    if navigation:
+        buttons.append(navigation)
+
+    buttons.append([
+        InlineKeyboardButton(text=mark(get_text(lang, "all_languages"), language == "*"), callback_data=page_data("n", "*")),
+        *(InlineKeyboardButton(text=mark(code.upper(), language == code), callback_data=page_data("n", code))
+          for code in LANGUAGES)
+    ])
+    buttons.append([
+        InlineKeyboardButton(text=mark(get_text(lang, "all_time"), not active_days), callback_data=page_data("n", page_days=0)),
+        InlineKeyboardButton(text=mark(get_text(lang, "active_days", days=USERS_ACTIVE_DAYS), bool(active_days)),
+                             callback_data=page_data("n", page_days=USERS_ACTIVE_DAYS))
+    ])
+    buttons.append([InlineKeyboardButton(text=get_text(lang, "back"), callback_data=callback_router.data("admin", "panel", lang))])
+
+    counters = (await run_db(get_statistics))["counters"]
+    count = counters.get("users", 0) if language == "*" else counters.get(f"users:lang:{language}", 0)
+    users_text = get_text(lang, "users_header", count=count)
 
-    users_text = get_text(lang, "users_header", count=len(users))
+    if not users:
+        users_text += get_text(lang, "users_empty")
 
+    user_info = current_tenant().translations[lang]["user_info"]
     for user in users:
         user_id, first_name, last_name, user_lang, joined_date, last_activity, views = user
         full_name = f"{first_name} {last_name}" if last_name else first_name
 
-        user_info_text = TRANSLATIONS[lang]["user_info"].format(
-            name=full_name,
+        user_info_text = user_info.format(
+            name=html.escape(full_name or ""),
             id=user_id,
-            lang=user_lang.upper(),
+            lang=(user_lang or "").upper(),
             joined=datetime.fromisoformat(joined_date).strftime("%Y-%m-%d %H:%M"),
             last=datetime.fromisoformat(last_activity).strftime("%Y-%m-%d %H:%M"),
             views=int(views) if views else 0
         )
         users_text += user_info_text
 
-    # Split if too long
-    if len(users_text) > 4096:
-        for i in range(0, len(users_text), 4096):
-            query.message.reply_text(text=users_text[i:i + 4096], parse_mode="HTML")
-    else:
-        query.edit_message_text(text=users_text, parse_mode="HTML")
+    try:
+        await query.edit_message_text(text=users_text, parse_mode="HTML", reply_markup=InlineKeyboardMarkup(buttons))
+    except BadRequest as e:
+        # Pressing the already selected filter leaves the message unchanged
+        if "not modified" not in str(e).lower():
+            raise
 
 
-def admin_callback_handler(update: Update, context: CallbackContext) -> int:
-    """Handle admin callback queries"""
+async def show_file_info(update: Update, context: ContextTypes.DEFAULT_TYPE, notice: str = "") -> None:
+    """Show the current resume versions with rollback buttons"""
     query = update.callback_query
+    lang = get_user_language(context)
 
-    if query.from_user.id != ADMIN_ID:
-        query.answer("🚫 Sizda bu huquq yo'q!", show_alert=True)
-        return ConversationHandler.END
+    files_info = ""
+    buttons = []
+    for name, (resume, older) in (await run_db(get_resume_versions_info)).items():
+        if resume:
+            size = resume["size"] / (1024 * 1024)
+            files_info += (
+                f"✅ <b>{name}</b> (v{resume['version']})\n"
+                f"   • Hajmi: {size:.2f} MB\n"
+                f"   • SHA-256: <code>{resume['sha256'][:16]}</code>\n"
+                f"   • Yuklangan: {resume['uploaded_at']}\n"
+                f"   • Yuklagan: {resume['uploaded_by'] or '-'}\n"
+                f"   • Oldingi versiyalar: {older}\n\n"
+            )
+            if older:
+                rollback_data = callback_router.data("admin", "rollback", name.removeprefix("resume_"))
+                buttons.append([InlineKeyboardButton(text=get_text(lang, "rollback", name=name),
+                                                     callback_data=rollback_data)])
+        else:
+            files_info += f"❌ <b>{name}:</b> Topilmadi\n\n"
 
-    query.answer()
+    try:
+        await query.edit_message_text(
+            text=notice + get_text(lang, "file_info_text", files=files_info),
+            parse_mode="HTML",
+            reply_markup=InlineKeyboardMarkup(buttons)
+        )
+    except BadRequest as e:
+        if "not modified" not in str(e).lower():
+            raise
+
+
+async def rollback_resume_version(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Make the previous version of a resume current again"""
     lang = get_user_language(context)
+    resume_type = f"resume_{context.args[0]}"
 
-    if query.data == "file_info":
-        files_info = ""
-        for name, path in RESUME_FILES.items():
-            if Path(path).exists():
-                size = Path(path).stat().st_size / (1024 * 1024)
-                mod_time = datetime.fromtimestamp(Path(path).stat().st_mtime).strftime("%Y-%m-%d %H:%M")
-                files_info += f"✅ <b>{name}</b>\n   • Hajmi: {size:.2f} MB\n   • O'zgartirilgan: {mod_time}\n\n"
-            else:
-                files_info += f"❌ <b>{name}:</b> Topilmadi\n\n"
+    resume = await run_db(rollback_resume, resume_type)
+    if resume is None:
+        notice = get_text(lang, "no_previous_version")
+    else:
+        logger.info("Resume %s v%s versiyaga qaytarildi", resume_type, resume['version'])
+        notice = get_text(lang, "rolled_back", name=resume_type, version=resume["version"])
 
-        query.edit_message_text(
-            text=get_text(lang, "file_info_text", files=files_info),
-            parse_mode="HTML"
-        )
-        return ConversationHandler.END
+    await show_file_info(update, context, notice + "\n\n")
 
-    elif query.data == "statistics":
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        cursor.execute("SELECT COUNT(*) FROM users")
-        user_count = cursor.fetchone()[0]
-        cursor.execute("SELECT COUNT(*) FROM user_actions WHERE action = 'download'")
-        download_count = cursor.fetchone()[0]
-        conn.close()
 
-        query.edit_message_text(
-            text=get_text(lang, "statistics_text", users=user_count,
-                          downloads=download_count, time=datetime.now().strftime('%Y-%m-%d %H:%M')),
-            parse_mode="HTML"
-        )
-        return ConversationHandler.END
+async def show_statistics(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Show bot statistics"""
+    query = update.callback_query
+    lang = get_user_language(context)
 
-    elif query.data == "users_list":
-        show_users_list(update, context)
-        return ConversationHandler.END
+    stats = await run_db(get_statistics)
+    counters = stats["counters"]
 
-    elif query.data.startswith("update_resume_"):
-        resume_type = query.data.replace("update_resume_", "")
-        context.user_data['resume_type'] = f"resume_{resume_type}"
-        query.edit_message_text(text=get_text(lang, "upload_file"))
-        return WAITING_FOR_RESUME
+    text = get_text(lang, "statistics_text", users=counters.get("users", 0),
+                    downloads=counters.get("actions:download", 0),
+                    time=datetime.now().strftime('%Y-%m-%d %H:%M'))
 
-    elif query.data == "send_message":
-        query.edit_message_text(text=get_text(lang, "send_msg_text"))
-        return WAITING_FOR_MESSAGE
+    languages = "\n".join(
+        f"   • {name[len('users:lang:'):].upper()}: {value}"
+        for name, value in sorted(counters.items()) if name.startswith("users:lang:") and value
+    )
+    if languages:
+        text += get_text(lang, "stats_languages", items=languages)
 
-    return ConversationHandler.END
+    resumes = "\n".join(
+        f"   • {name[len('downloads:'):]}: {value}"
+        for name, value in sorted(counters.items()) if name.startswith("downloads:") and value
+    )
+    if resumes:
+        text += get_text(lang, "stats_resumes", items=resumes)
+
+    if stats["daily"]:
+        daily = "\n".join(f"   • {day}: {count}" for day, count in stats["daily"])
+        text += get_text(lang, "stats_daily", days=STATS_DAYS, items=daily)
+
+    slowest = [
+        f"   • {prefix}{name}: {p95 * 1000:.1f} ms (n={count})"
+        for prefix, histogram, label, limit in (("", HANDLER_LATENCY, "handler", 5),
+                                                ("db ", DB_LATENCY, "query", 3),
+                                                ("api ", API_LATENCY, "method", 3))
+        for name, p95, count in histogram.slowest(label, limit)
+    ]
+    if slowest:
+        text += get_text(lang, "stats_latency", items=html.escape("\n".join(slowest)))
+
+    file_ids = {dict(labels)["result"]: value for _, labels, value in FILE_ID_CACHE.samples()}
+    user_cache = current_tenant().user_cache
+    text += get_text(lang, "stats_cache",
+                     users=_hit_rate(user_cache.hits, user_cache.misses),
+                     files=_hit_rate(file_ids.get("hit", 0), file_ids.get("miss", 0)))
+
+    await query.edit_message_text(text=text, parse_mode="HTML")
+
+
+async def start_resume_update(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    """Ask the admin for a new resume file"""
+    context.user_data['resume_type'] = f"resume_{context.args[0]}"
+    await update.callback_query.edit_message_text(text=get_text(get_user_language(context), "upload_file"))
+    return WAITING_FOR_RESUME
+
+
+async def start_admin_message(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    """Ask the admin for a message to broadcast"""
+    await update.callback_query.edit_message_text(text=get_text(get_user_language(context), "send_msg_text"))
+    return WAITING_FOR_MESSAGE
 
 
-def handle_resume_upload(update: Update, context: CallbackContext) -> int:
+async def handle_resume_upload(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Handle resume file upload"""
-    if update.message.from_user.id != ADMIN_ID:
-        update.message.reply_text("🚫 No access!")
+    if not is_admin(update.message.from_user.id):
+        await update.message.reply_text("🚫 No access!")
         return ConversationHandler.END
 
     lang = get_user_language(context)
 
     if not update.message.document:
-        update.message.reply_text(get_text(lang, "no_file"))
+        await update.message.reply_text(get_text(lang, "no_file"))
         return WAITING_FOR_RESUME
 
     resume_type = context.user_data.get('resume_type')
     if not resume_type:
-        update.message.reply_text("❌ Xato yuz berdi.")
+        await update.message.reply_text("❌ Xato yuz berdi.")
         return ConversationHandler.END
 
-    file_path = RESUME_FILES[resume_type]
-    file_dir = Path(file_path).parent
-    file_dir.mkdir(parents=True, exist_ok=True)
+    document = update.message.document
+    if document.file_size and document.file_size > RESUME_MAX_SIZE:
+        await update.message.reply_text(get_text(lang, "file_too_large", max=RESUME_MAX_SIZE // (1024 * 1024)))
+        return WAITING_FOR_RESUME
 
-    if Path(file_path).exists():
-        try:
-            Path(file_path).unlink()
-            logger.info(f"Eski fayl o'chirildi: {file_path}")
-        except Exception as e:
-            logger.error(f"Error deleting file: {e}")
-            update.message.reply_text(f"❌ {str(e)}")
-            return ConversationHandler.END
+    # Download next to the versions so the final move is an atomic rename;
+    # the current version keeps being served until the new one is verified
+    temp_path = _resume_version_dir(resume_type) / f".upload-{update.message.message_id}.tmp"
 
     try:
-        new_file = context.bot.get_file(update.message.document.file_id)
-        new_file.download(file_path)
-        logger.info(f"Yangi resume yuklandi: {file_path}")
-
-        file_size = Path(file_path).stat().st_size / (1024 * 1024)
-        update.message.reply_text(
-            get_text(lang, "updated", file=file_path, size=file_size, time=datetime.now().strftime('%Y-%m-%d %H:%M')),
+        new_file = await context.bot.get_file(document.file_id)
+        await new_file.download_to_drive(temp_path)
+        resume = await run_db(store_resume_version, resume_type, str(temp_path), update.message.from_user.id)
+        logger.info("Yangi resume yuklandi: %s (v%s)", resume['path'], resume['version'])
+
+        # Admin's uploaded document can be re-sent by file_id without uploading bytes again
+        await run_db(save_cached_file_id, resume_type, resume["sha256"], document.file_id)
+
+        file_size = resume["size"] / (1024 * 1024)
+        await update.message.reply_text(
+            get_text(lang, "updated", file=f"{resume['path']} (v{resume['version']})", size=file_size,
+                     time=datetime.now().strftime('%Y-%m-%d %H:%M')),
             parse_mode="HTML"
         )
+    except ValueError as e:
+        logger.warning("Resume tekshiruvdan o'tmadi: %s", e)
+        await update.message.reply_text(get_text(lang, str(e), max=RESUME_MAX_SIZE // (1024 * 1024)))
+        return WAITING_FOR_RESUME
     except Exception as e:
-        logger.error(f"Error uploading: {e}")
-        update.message.reply_text(f"❌ {str(e)}")
+        Path(temp_path).unlink(missing_ok=True)
+        logger.error("Error uploading: %s", e)
+        await update.message.reply_text(f"❌ {str(e)}")
+        context.user_data.pop('resume_type', None)
         return ConversationHandler.END
 
+    context.user_data.pop('resume_type', None)
     return ConversationHandler.END
 
 
-def handle_admin_message(update: Update, context: CallbackContext) -> int:
+async def handle_admin_message(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Handle admin message to broadcast"""
-    if update.message.from_user.id != ADMIN_ID:
-        update.message.reply_text("🚫 No access!")
+    if not is_admin(update.message.from_user.id):
+        await update.message.reply_text("🚫 No access!")
         return ConversationHandler.END
 
     lang = get_user_language(context)
     message_text = update.message.text
 
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute("SELECT user_id FROM users")
-    users = cursor.fetchall()
-    conn.close()
-
-    if not users:
-        update.message.reply_text("❌ No users to send message!")
-        return ConversationHandler.END
-
-    success_count = 0
-    failed_count = 0
-
-    for user in users:
-        user_id = user[0]
-        try:
-            context.bot.send_message(
-                chat_id=user_id,
-                text=get_text(lang, "admin_msg", msg=message_text),
-                parse_mode="HTML"
-            )
-            success_count += 1
-        except Exception as e:
-            logger.error(f"Error sending to {user_id}: {e}")
-            failed_count += 1
-
-    update.message.reply_text(
-        get_text(lang, "msg_sent", success=success_count, failed=failed_count),
-        parse_mode="HTML"
-    )
+    try:
+        await current_tenant().broadcast_manager.start(
+            context.bot,
+            update.message.chat_id,
+            get_text(lang, "admin_msg", msg=message_text),
+            lang
+        )
+    except Exception as e:
+        logger.error("Broadcast boshlanmadi: %s", e)
+        await update.message.reply_text(f"❌ {str(e)}")
 
     return ConversationHandler.END
 
 
-def cancel(update: Update, context: CallbackContext) -> int:
+async def cancel(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Cancel operation"""
+    context.user_data.pop('resume_type', None)
     lang = get_user_language(context)
     if update.message:
-        update.message.reply_text(get_text(lang, "cancelled"))
+        await update.message.reply_text(get_text(lang, "cancelled"))
     return ConversationHandler.END
 
 
-def error_handler(update: object, context: CallbackContext) -> None:
+async def error_handler(update: object, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Log errors"""
-    logger.error(msg="Exception while handling an update:", exc_info=context.error)
+    user = getattr(update, "effective_user", None)
+    logger.error(msg="Exception while handling an update:", exc_info=context.error, extra={
+        "update_id": getattr(update, "update_id", None),
+        "user_id": user.id if user else None,
+    })
+
+
+# Callback routes; admin routes are rejected by the router for everyone else
+_languages = LANGUAGES
+_resume_types = tuple(name.removeprefix("resume_") for name in RESUME_FILES)
+
+callback_router.add("lang", "set", set_language, args=(_languages,))
+callback_router.add("menu", "back", back_to_menu)
+callback_router.add("menu", "contact", contact_handler)
+callback_router.add("menu", "language", change_language_menu)
+callback_router.add("resume", "get", download_resume, args=(_resume_types,))
+callback_router.add("admin", "panel", show_admin_panel, args=(_languages,), admin=True)
+callback_router.add("admin", "stats", show_statistics, admin=True)
+callback_router.add("admin", "users", show_users_list, admin=True,
+                    args=(("n", "p"), ("*", *_languages), ("0", str(USERS_ACTIVE_DAYS)), None, None))
+callback_router.add("admin", "files", show_file_info, admin=True)
+callback_router.add("admin", "rollback", rollback_resume_version, args=(_resume_types,), admin=True)
+callback_router.add("admin", "upload", start_resume_update, args=(_resume_types,), admin=True, conversation=True)
+callback_router.add("admin", "message", start_admin_message, admin=True, conversation=True)
+
+# Payloads of buttons sent before versioned callback data
+for _code in _languages:
+    callback_router.alias(f"lang_{_code}", "lang", "set", _code)
+    callback_router.alias(f"lang_admin_{_code}", "admin", "panel", _code)
+for _name in _resume_types:
+    callback_router.alias(f"resume_{_name}", "resume", "get", _name)
+    callback_router.alias(f"update_resume_{_name}", "admin", "upload", _name)
+    callback_router.alias(f"rollback_resume_{_name}", "admin", "rollback", _name)
+callback_router.alias("back_menu", "menu", "back")
+callback_router.alias("contact", "menu", "contact")
+callback_router.alias("change_lang", "menu", "language")
+callback_router.alias("statistics", "admin", "stats")
+callback_router.alias("users_list", "admin", "users", "n", "*", "0", "", "")
+callback_router.alias("file_info", "admin", "files")
+callback_router.alias("send_message", "admin", "message")
+
+
+metrics_server = None
+
+
+async def _serve_metrics(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    try:
+        request_line = await asyncio.wait_for(reader.readline(), timeout=5)
+        # Drain the headers
+        while (await asyncio.wait_for(reader.readline(), timeout=5)) not in (b"\r\n", b"\n", b""):
+            pass
+
+        parts = request_line.decode("latin-1").split()
+        if len(parts) >= 2 and parts[0] == "GET" and parts[1].split("?")[0] == "/metrics":
+            status, body = "200 OK", metrics.render().encode()
+        else:
+            status, body = "404 Not Found", b"not found\n"
+
+        writer.write(
+            f"HTTP/1.1 {status}\r\nContent-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+            f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body
+        )
+        await writer.drain()
+    except (asyncio.TimeoutError, ConnectionError):
+        pass
+    finally:
+        writer.close()
 
 
-def main() -> None:
-    """Start the bot"""
-    # Initialize database
-    init_database()
+async def start_metrics_server():
+    """Serve /metrics on METRICS_HOST:METRICS_PORT (disabled when the port is 0)"""
+    if not METRICS_PORT:
+        return None
+    server = await asyncio.start_server(_serve_metrics, METRICS_HOST, METRICS_PORT)
+    logger.info("Metrikalar: http://%s:%s/metrics", METRICS_HOST, METRICS_PORT)
+    return server
 
-    token = os.getenv("TELEGRAM_BOT_TOKEN")
 
-    if not token:
-        raise ValueError("TELEGRAM_BOT_TOKEN topilmadi!")
+class MetricsRequest(BaseRequest):
+    """Request wrapper that records Bot API latency and status codes"""
 
-    updater = Updater(token=token)
-    dispatcher = updater.dispatcher
+    def __init__(self, request: BaseRequest):
+        self._request = request
 
-    # Regular handlers
-    dispatcher.add_handler(CommandHandler("start", start_func))
-    dispatcher.add_handler(CommandHandler("resume", resume_menu))
-    dispatcher.add_handler(CommandHandler("admin", admin_panel))
+    async def initialize(self) -> None:
+        await self._request.initialize()
 
-    # Language selection
-    dispatcher.add_handler(CallbackQueryHandler(set_language, pattern="^lang_uz|^lang_ru|^lang_en"))
-    dispatcher.add_handler(CallbackQueryHandler(show_admin_panel, pattern="^lang_admin_"))
-    dispatcher.add_handler(CallbackQueryHandler(change_language_menu, pattern="^change_lang"))
+    async def shutdown(self) -> None:
+        await self._request.shutdown()
+
+    @property
+    def read_timeout(self):
+        return self._request.read_timeout
+
+    async def do_request(self, url, method, request_data=None, read_timeout=None, write_timeout=None,
+                         connect_timeout=None, pool_timeout=None):
+        started = time.perf_counter()
+        code = "network_error"
+        try:
+            code, payload = await self._request.do_request(
+                url, method, request_data=request_data, read_timeout=read_timeout,
+                write_timeout=write_timeout, connect_timeout=connect_timeout, pool_timeout=pool_timeout
+            )
+            return code, payload
+        finally:
+            API_LATENCY.observe(time.perf_counter() - started, method=url.rsplit("/", 1)[-1], code=code)
+
+
+@functools.lru_cache(maxsize=None)
+def _tls_context():
+    # Loading the CA bundle takes ~40 ms, so every connection pool shares one context
+    return httpx.create_ssl_context()
+
+
+def http_request(connection_pool_size: int) -> HTTPXRequest:
+    """A Bot API connection pool using the shared TLS context"""
+    return HTTPXRequest(connection_pool_size=connection_pool_size, httpx_kwargs={"verify": _tls_context()})
+
+
+class SharedRequest(BaseRequest):
+    """Lets the bots of all tenants use one connection pool; its owner shuts the pool down"""
+
+    def __init__(self, request: BaseRequest):
+        self._request = request
+
+    async def initialize(self) -> None:
+        await self._request.initialize()
+
+    async def shutdown(self) -> None:
+        # One bot shutting down must not close the pool of the others
+        pass
+
+    @property
+    def read_timeout(self):
+        return self._request.read_timeout
+
+    async def do_request(self, url, method, request_data=None, read_timeout=None, write_timeout=None,
+                         connect_timeout=None, pool_timeout=None):
+        return await self._request.do_request(
+            url, method, request_data=request_data, read_timeout=read_timeout,
+            write_timeout=write_timeout, connect_timeout=connect_timeout, pool_timeout=pool_timeout
+        )
+
+
+def _hit_rate(hits: int, misses: int) -> str:
+    return f"{hits * 100 / (hits + misses):.0f}" if hits + misses else "-"
+
+
+def _timed_callback(callback, label: str):
+    @functools.wraps(callback)
+    async def wrapper(update, context):
+        user = getattr(update, "effective_user", None)
+        token = _log_context.set({
+            "handler": label,
+            "update_id": getattr(update, "update_id", None),
+            "user_id": user.id if user else None,
+        })
+        started = time.perf_counter()
+        status = "error"
+        try:
+            result = await callback(update, context)
+            status = "ok"
+            return result
+        except ApplicationHandlerStop:
+            status = "ok"
+            raise
+        finally:
+            latency = time.perf_counter() - started
+            HANDLER_LATENCY.observe(latency, handler=label, status=status)
+            logger.info("Handler %s: %s", status, label,
+                        extra={"latency_ms": round(latency * 1000, 2), "sampled": True})
+            _log_context.reset(token)
+
+    return wrapper
+
+
+def _handler_label(handler) -> str:
+    if isinstance(handler, CommandHandler):
+        return "/" + "|/".join(sorted(handler.commands))
+    if isinstance(handler, CallbackQueryHandler) and handler.pattern is not None:
+        return getattr(handler.pattern, "pattern", str(handler.pattern))
+    if isinstance(handler, MessageHandler):
+        return f"message:{handler.filters}"
+    return handler.callback.__name__
+
+
+def instrument_handlers(handlers) -> None:
+    """Wrap every handler callback (including conversation states) with latency timing"""
+    for handler in handlers:
+        if isinstance(handler, ConversationHandler):
+            instrument_handlers(handler.entry_points)
+            for state_handlers in handler.states.values():
+                instrument_handlers(state_handlers)
+            instrument_handlers(handler.fallbacks)
+        elif getattr(handler.callback, "__self__", None) is callback_router:
+            # Routes are timed one by one, labelled namespace:action
+            callback_router.instrument(_timed_callback)
+        else:
+            handler.callback = _timed_callback(handler.callback, _handler_label(handler))
+
+
+# Applications between post_init and post_shutdown; the last one to shut down
+# releases what all tenants share
+running_applications = 0
+
+
+async def post_init(application: Application) -> None:
+    """Resume background work once the bot is initialized"""
+    global metrics_server, running_applications
+    if not running_applications:
+        metrics_server = await start_metrics_server()
+    running_applications += 1
+
+    tenant = current_tenant()
+    # Broadcasts belong to the admin's chat, so only the admin's worker resumes them
+    if worker_for(tenant.admin_id, worker_count) == worker_index:
+        await tenant.broadcast_manager.resume_pending(application.bot)
+
+
+async def post_stop(application: Application) -> None:
+    """Let running broadcasts finish their current chunk before the bot shuts down"""
+    await current_tenant().broadcast_manager.stop()
+
+
+async def post_shutdown(application: Application) -> None:
+    """Flush pending writes and release database resources"""
+    global running_applications
+    tenant = current_tenant()
+    tenant.action_logger.stop()
+    tenant.analytics_log.close()
+
+    running_applications -= 1
+    if running_applications:
+        return
+    if metrics_server is not None:
+        metrics_server.close()
+        await metrics_server.wait_closed()
+    close_connections()
+    _db_executor.shutdown(wait=True)
+
+
+def build_application(token: str, request: BaseRequest = None, get_updates_request: BaseRequest = None) -> Application:
+    """Create the current tenant's application and register all handlers"""
+    builder = (
+        Application.builder()
+        .token(token)
+        # Worker processes keep the update order of each chat and share the global API rate
+        .concurrent_updates(ChatOrderedUpdateProcessor(CONCURRENT_UPDATES) if worker_count > 1 else CONCURRENT_UPDATES)
+        .request(MetricsRequest(request or http_request(HTTP_POOL_SIZE)))
+        .persistence(SQLitePersistence())
+        .context_types(ContextTypes(user_data=UserData))
+        .rate_limiter(OutboundScheduler(rate=OUTBOUND_RATE / worker_count))
+        .post_init(post_init)
+        .post_stop(post_stop)
+        .post_shutdown(post_shutdown)
+    )
+    builder.get_updates_request(get_updates_request or http_request(1))
+    application = builder.build()
+    application.persistence.application = application
+    current_tenant().application = application
+
+    # Run first for every update
+    application.add_handler(TypeHandler(Update, check_flood), group=-2)
+    application.add_handler(TypeHandler(Update, restore_user_language), group=-1)
+
+    # Regular handlers
+    application.add_handler(CommandHandler("start", start_func))
+    application.add_handler(CommandHandler("resume", resume_menu))
+    application.add_handler(CommandHandler("admin", admin_panel))
+    application.add_handler(CommandHandler("recount", recount_statistics, block=False))
+    application.add_handler(CommandHandler("export", export_data, block=False))
 
     # Conversation handler for admin uploads and messages
     conv_handler = ConversationHandler(
         entry_points=[
-            CallbackQueryHandler(admin_callback_handler, pattern="^update_resume_|^send_message")
+            CallbackQueryHandler(callback_router.dispatch, pattern=callback_router.matcher(conversation=True))
         ],
         states={
             WAITING_FOR_RESUME: [
-                MessageHandler(Filters.document, handle_resume_upload),
+                MessageHandler(filters.Document.ALL, handle_resume_upload),
                 CommandHandler("cancel", cancel)
             ],
             WAITING_FOR_MESSAGE: [
-                MessageHandler(Filters.text & ~Filters.command, handle_admin_message),
+                MessageHandler(filters.TEXT & ~filters.COMMAND, handle_admin_message),
                 CommandHandler("cancel", cancel)
             ]
         },
         fallbacks=[CommandHandler("cancel", cancel)],
-        per_message=False
+        per_message=False,
+        name="admin_conversation",
+        persistent=True
     )
 
-    dispatcher.add_handler(conv_handler)
-    dispatcher.add_handler(CallbackQueryHandler(download_resume, pattern="^resume_"))
-    dispatcher.add_handler(CallbackQueryHandler(admin_callback_handler, pattern="^file_info|^statistics|^users_list"))
-    dispatcher.add_handler(CallbackQueryHandler(contact_handler, pattern="^contact"))
-    dispatcher.add_handler(CallbackQueryHandler(back_to_menu, pattern="^back_menu"))
-    dispatcher.add_handler(MessageHandler(Filters.text & ~Filters.command, resume_menu))
+    application.add_handler(conv_handler)
+    # Every other callback query, including unknown and stale ones
+    application.add_handler(
+        CallbackQueryHandler(callback_router.dispatch, pattern=callback_router.matcher(conversation=False)))
+    application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, resume_menu))
 
     # Error handler
-    dispatcher.add_error_handler(error_handler)
+    application.add_error_handler(error_handler)
+
+    for handlers in application.handlers.values():
+        instrument_handlers(handlers)
 
-    logger.info("Bot started successfully ✅")
-    updater.start_polling()
-    updater.idle()
+    metrics.gauge("bot_update_queue_size", "Updates waiting to be processed",
+                  lambda: sum(tenant.application.update_queue.qsize() for tenant in tenants if tenant.application))
+    metrics.gauge("bot_outbound_queue_size", "Bot API calls waiting for a global token",
+                  lambda: sum(tenant.application.bot.rate_limiter.queue_depth
+                              for tenant in tenants if tenant.application))
+
+    return application
+
+
+# Set by run_worker in worker processes
+worker_index = 0
+worker_count = 1
+
+
+def worker_for(chat_id: int, workers: int) -> int:
+    """Index of the worker process that handles a chat"""
+    return chat_id % workers
+
+
+class ChatOrderedUpdateProcessor(BaseUpdateProcessor):
+    """Processes updates concurrently, except that updates of one chat run one
+    after another in the order they arrived"""
+
+    def __init__(self, max_concurrent_updates: int):
+        super().__init__(max_concurrent_updates)
+        self._chats = {}  # chat_id -> [lock, updates holding or waiting for it]
+
+    async def do_process_update(self, update, coroutine) -> None:
+        chat = update.effective_chat if isinstance(update, Update) else None
+        if chat is None:
+            await coroutine
+            return
+
+        entry = self._chats.get(chat.id)
+        if entry is None:
+            entry = self._chats[chat.id] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                await coroutine
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del self._chats[chat.id]
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
+
+
+def _next_update(updates):
+    """Block until the next update; None once told to stop or when the ingress process is gone"""
+    parent = multiprocessing.parent_process()
+    while True:
+        try:
+            return updates.get(timeout=1.0)
+        except queue.Empty:
+            if parent is not None and not parent.is_alive():
+                return None
+
+
+async def _serve_updates(application: Application, updates) -> None:
+    """Feed updates from the ingress process to the application until told to stop"""
+    loop = asyncio.get_running_loop()
+    await application.initialize()
+    await application.post_init(application)
+    await application.start()
+    try:
+        while True:
+            data = await loop.run_in_executor(None, _next_update, updates)
+            if data is None:
+                break
+            await application.update_queue.put(Update.de_json(data, application.bot))
+    finally:
+        await application.stop()
+        await application.post_stop(application)
+        await application.shutdown()
+        await application.post_shutdown(application)
+
+
+def run_worker(index: int, workers: int, token: str, updates) -> None:
+    """Entry point of a worker process: handle the updates of the chats assigned to it"""
+    global worker_index, worker_count, METRICS_PORT
+    worker_index, worker_count = index, workers
+
+    # The supervisor stops workers through their queue after the ingress has drained
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    atexit.register(setup_logging().stop)
+
+    if METRICS_PORT:
+        METRICS_PORT += 1 + index
+    # Segments of one log must not be compacted by several processes
+    analytics_log = default_tenant.analytics_log = AnalyticsLog(Path(ANALYTICS_DIR) / f"worker-{index}")
+    analytics_log.directory.mkdir(parents=True, exist_ok=True)
+
+    default_tenant.action_logger.start()
+    logger.info("Worker %s/%s: %s ta profil yuklandi", index, workers, default_tenant.user_cache.warm())
+    asyncio.run(_serve_updates(build_application(token), updates))
+
+
+WORKER_UPDATES = metrics.counter("bot_worker_updates_total", "Updates handed to worker processes")
+WORKER_RESTARTS = metrics.counter("bot_worker_restarts_total", "Worker processes restarted after exiting")
+
+
+class WorkerPool:
+    """Worker processes fed by the ingress process, restarted when they exit.
+
+    Every worker has its own queue. A restarted worker gets a new one, since
+    a process killed while reading may leave the old queue locked; updates
+    still in the old queue are lost.
+    """
+
+    def __init__(self, workers: int, token: str):
+        self.workers = workers
+        self.token = token
+        self._context = multiprocessing.get_context("spawn")
+        self._processes = [None] * workers
+        self._queues = [None] * workers
+        self._started = [0.0] * workers
+        self._delays = [WORKER_RESTART_DELAY] * workers
+        self._restart_at = [None] * workers
+        self.dropped = 0
+
+    def _start(self, index: int) -> None:
+        if self._queues[index] is None:
+            self._queues[index] = self._context.Queue(maxsize=WORKER_QUEUE_SIZE)
+        process = self._context.Process(target=run_worker, name=f"worker-{index}",
+                                        args=(index, self.workers, self.token, self._queues[index]))
+        process.start()
+        self._processes[index] = process
+        self._started[index] = time.monotonic()
+        self._restart_at[index] = None
+
+    def start(self) -> None:
+        for index in range(self.workers):
+            self._start(index)
+        metrics.gauge("bot_workers_alive", "Worker processes running",
+                      lambda: sum(1 for process in self._processes if process and process.is_alive()))
+        metrics.gauge("bot_worker_dropped_total", "Updates dropped because a worker queue was full",
+                      lambda: self.dropped, "counter")
+
+    def dispatch(self, update: Update) -> None:
+        """Queue an update for the worker of its chat (or user)"""
+        chat, user = update.effective_chat, update.effective_user
+        key = chat.id if chat else user.id if user else update.update_id
+        index = worker_for(key, self.workers)
+        try:
+            self._queues[index].put_nowait(update.to_dict())
+        except queue.Full:
+            self.dropped += 1
+            logger.warning("Worker %s navbati to'la, update %s tashlab yuborildi", index, update.update_id)
+            return
+        WORKER_UPDATES.inc(worker=index)
+
+    def _check(self, index: int, now: float) -> None:
+        process = self._processes[index]
+        if self._restart_at[index] is None:
+            if process.is_alive():
+                return
+            # New updates wait in a fresh queue until the worker is back
+            lost = self._queues[index]
+            self._queues[index] = self._context.Queue(maxsize=WORKER_QUEUE_SIZE)
+            try:
+                pending = lost.qsize()
+            except NotImplementedError:
+                pending = "?"
+            lost.cancel_join_thread()
+            lost.close()
+
+            if now - self._started[index] >= WORKER_STABLE_AFTER:
+                self._delays[index] = WORKER_RESTART_DELAY
+            delay = self._delays[index]
+            self._delays[index] = min(delay * 2, WORKER_MAX_RESTART_DELAY)
+            self._restart_at[index] = now + delay
+            logger.error("Worker %s to'xtadi (exit code %s, %s ta update yo'qoldi), %ss dan keyin qayta ishga tushadi",
+                         index, process.exitcode, pending, delay)
+
+        if now >= self._restart_at[index]:
+            WORKER_RESTARTS.inc(worker=index)
+            self._start(index)
+
+    async def supervise(self, interval: float = 1.0) -> None:
+        """Restart workers that exited, backing off while they keep crashing"""
+        while True:
+            await asyncio.sleep(interval)
+            now = time.monotonic()
+            for index in range(self.workers):
+                self._check(index, now)
+
+    def stop(self) -> None:
+        """Let every worker finish its queue, then wait for it to exit"""
+        for index, process in enumerate(self._processes):
+            if process is not None and process.is_alive():
+                self._queues[index].put(None)
+
+        deadline = time.monotonic() + WORKER_STOP_TIMEOUT
+        for index, process in enumerate(self._processes):
+            if process is None:
+                continue
+            process.join(max(0.0, deadline - time.monotonic()))
+            if process.is_alive():
+                logger.warning("Worker %s %ss ichida to'xtamadi", index, WORKER_STOP_TIMEOUT)
+                process.terminate()
+                process.join()
+
+
+async def run_ingress(token: str, workers: int) -> None:
+    """Receive updates (polling or webhook) and hand them to worker processes"""
+    global metrics_server
+    pool = WorkerPool(workers, token)
+    pool.start()
+    supervisor = asyncio.create_task(pool.supervise())
+    metrics_server = await start_metrics_server()
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, stop.set)
+
+    update_queue = asyncio.Queue()
+    updater = Updater(Bot(token, request=http_request(1), get_updates_request=http_request(1)), update_queue)
+
+    async def forward() -> None:
+        while True:
+            pool.dispatch(await update_queue.get())
+
+    try:
+        async with updater:
+            if BOT_MODE == "webhook":
+                await updater.start_webhook(
+                    listen=WEBHOOK_LISTEN,
+                    port=WEBHOOK_PORT,
+                    url_path=WEBHOOK_PATH,
+                    secret_token=WEBHOOK_SECRET,
+                    webhook_url=f"{WEBHOOK_URL.rstrip('/')}/{WEBHOOK_PATH}",
+                    allowed_updates=Update.ALL_TYPES
+                )
+            else:
+                await updater.start_polling(allowed_updates=Update.ALL_TYPES)
+            logger.info("Ingress ishga tushdi: %s ta worker (%s)", workers, BOT_MODE)
+
+            forwarder = asyncio.create_task(forward())
+            await stop.wait()
+            await updater.stop()
+            forwarder.cancel()
+            while not update_queue.empty():
+                pool.dispatch(update_queue.get_nowait())
+    finally:
+        supervisor.cancel()
+        await asyncio.to_thread(pool.stop)
+        if metrics_server is not None:
+            metrics_server.close()
+            await metrics_server.wait_closed()
+
+
+async def _start_tenant(tenant: Tenant, request: BaseRequest, get_updates_request: BaseRequest):
+    """Prepare a tenant's data and start its bot; returns the application, None if it failed"""
+    _current_tenant.set(tenant)
+    try:
+        await run_db(init_database)
+        await run_db(bootstrap_resume_versions)
+        await asyncio.to_thread(tenant.analytics_log.import_legacy, tenant.analytics_file)
+        tenant.action_logger.start()
+        logger.info("Foydalanuvchi keshi: %s ta profil yuklandi", await run_db(tenant.user_cache.warm))
+
+        application = build_application(tenant.token, request, get_updates_request)
+        await application.initialize()
+    except Exception as e:
+        logger.error("Bot ishga tushmadi: %s", e, exc_info=True)
+        tenant.action_logger.stop()
+        return None
+
+    # Tasks started from here (update fetcher, polling, handlers) inherit the tenant
+    await application.post_init(application)
+    await application.start()
+    await application.updater.start_polling(allowed_updates=Update.ALL_TYPES)
+    return application
+
+
+async def _stop_tenant(tenant: Tenant, application: Application) -> None:
+    _current_tenant.set(tenant)
+    try:
+        await application.updater.stop()
+        await application.stop()
+        await application.post_stop(application)
+    finally:
+        await application.shutdown()
+        await application.post_shutdown(application)
+
+
+async def run_tenants(hosted: list) -> None:
+    """Serve the bots of all tenants from this process (long polling).
+
+    The bots share one connection pool for API calls and one for getUpdates,
+    plus the database thread pool, logging and the metrics server.
+    """
+    request = http_request(HTTP_POOL_SIZE)
+    get_updates_request = http_request(len(hosted))
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, stop.set)
+
+    try:
+        applications = await asyncio.gather(*(
+            _start_tenant(tenant, SharedRequest(request), SharedRequest(get_updates_request)) for tenant in hosted
+        ))
+        started = [(tenant, application) for tenant, application in zip(hosted, applications) if application]
+        logger.info("Bot started successfully ✅ (%s/%s ta tenant)", len(started), len(hosted))
+
+        if started:
+            await stop.wait()
+            await asyncio.gather(*(_stop_tenant(tenant, application) for tenant, application in started))
+    finally:
+        await request.shutdown()
+        await get_updates_request.shutdown()
+
+
+def main() -> None:
+    """Start the bot"""
+    atexit.register(setup_logging().stop)
+
+    if TENANTS_DIR:
+        if WORKERS > 1 or BOT_MODE == "webhook":
+            raise ValueError("TENANTS_DIR faqat polling rejimida va WORKERS=1 bilan ishlaydi!")
+        tenants[:] = load_tenants(TENANTS_DIR)
+        asyncio.run(run_tenants(tenants))
+        return
+
+    # Initialize database (migrations run here, before any worker starts)
+    init_database()
+    bootstrap_resume_versions()
+
+    try:
+        default_tenant.analytics_log.import_legacy()
+    except Exception as e:
+        logger.error("Analytics import xatosi: %s", e)
+
+    token = os.getenv("TELEGRAM_BOT_TOKEN")
+
+    if not token:
+        raise ValueError("TELEGRAM_BOT_TOKEN topilmadi!")
+    if BOT_MODE == "webhook" and not WEBHOOK_SECRET:
+        raise ValueError("WEBHOOK_SECRET topilmadi!")
+    # Telegram only accepts a public HTTPS URL, not one built from the listen address
+    if BOT_MODE == "webhook" and not WEBHOOK_URL:
+        raise ValueError("WEBHOOK_URL topilmadi!")
+
+    if WORKERS > 1:
+        close_connections()
+        asyncio.run(run_ingress(token, WORKERS))
+        return
+
+    default_tenant.action_logger.start()
+    logger.info("Foydalanuvchi keshi: %s ta profil yuklandi", default_tenant.user_cache.warm())
+    application = build_application(token)
+
+    if BOT_MODE == "webhook":
+
+        # Telegram's X-Telegram-Bot-Api-Secret-Token header is checked on every request;
+        # updates are queued and acknowledged before they are processed
+        logger.info("Bot started successfully ✅ (webhook %s:%s/%s)", WEBHOOK_LISTEN, WEBHOOK_PORT, WEBHOOK_PATH)
+        application.run_webhook(
+            listen=WEBHOOK_LISTEN,
+            port=WEBHOOK_PORT,
+            url_path=WEBHOOK_PATH,
+            secret_token=WEBHOOK_SECRET,
+            webhook_url=f"{WEBHOOK_URL.rstrip('/')}/{WEBHOOK_PATH}",
+            allowed_updates=Update.ALL_TYPES
+        )
+    else:
+        logger.info("Bot started successfully ✅")
+        application.run_polling(allowed_updates=Update.ALL_TYPES)
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,50 @@
+"""Check the translation catalogs in locales/ and compile them.
+
+    python tools/compile_translations.py [--check]
+
+Every catalog must have the keys of the default (uz) catalog, with the same
+placeholders. Unless --check is given, the catalogs are then compiled to
+locales/<lang>.bin, which the bot otherwise does when a language is first
+used. The exit status is 1 when a catalog is invalid.
+"""
+import argparse
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import my_resume  # noqa: E402
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--check", action="store_true", help="only check, don't compile")
+    args = parser.parse_args()
+
+    directory = my_resume.LOCALES_DIR
+    errors = [f"{path.name}: not in LANGUAGES" for path in sorted(directory.glob("*.json"))
+              if path.stem not in my_resume.LANGUAGES]
+
+    catalogs = {}
+    for lang in my_resume.LANGUAGES:
+        try:
+            catalogs[lang] = my_resume.read_catalog(lang, directory)
+        except (OSError, ValueError) as e:
+            errors.append(f"{lang}: {e}")
+
+    if "uz" in catalogs:
+        for lang, texts in catalogs.items():
+            errors.extend(my_resume.translation_errors(catalogs["uz"], texts, lang))
+
+    if errors:
+        print("\n".join(errors), file=sys.stderr)
+        sys.exit(1)
+
+    for lang in my_resume.LANGUAGES:
+        if not args.check:
+            my_resume.compile_catalog(lang, directory)
+        print(f"{lang}: {len(catalogs[lang])} texts ok" + ("" if args.check else f", compiled to {lang}.bin"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+"""POST recorded Telegram update JSON at a locally running webhook.
+
+    BOT_MODE=webhook WEBHOOK_SECRET=secret WEBHOOK_URL=https://<tunnel to :8443> python my_resume.py
+    python tools/post_update.py tools/sample_updates/start.json --secret secret
+
+The bot registers WEBHOOK_URL with Telegram on startup, which must be a public
+HTTPS URL, so use a test bot's token. Each file may contain a single update
+object or a list of updates.
+"""
+import argparse
+import json
+import sys
+
+import httpx
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("files", nargs="+", help="update JSON files")
+    parser.add_argument("--url", default="http://127.0.0.1:8443/telegram", help="webhook endpoint")
+    parser.add_argument("--secret", required=True, help="value of WEBHOOK_SECRET")
+    args = parser.parse_args()
+
+    headers = {"X-Telegram-Bot-Api-Secret-Token": args.secret}
+
+    with httpx.Client(timeout=10) as client:
+        for path in args.files:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+
+            for update in data if isinstance(data, list) else [data]:
+                response = client.post(args.url, json=update, headers=headers)
+                print(f"{path} update_id={update.get('update_id')}: {response.status_code}")
+                if response.status_code != 200:
+                    sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()